@@ -0,0 +1,47 @@
+# alias.py
+# October 2026.
+# Walker alias tables: after O(n) setup, each draw from a discrete distribution over n
+# outcomes costs one uniform integer and one uniform real, whatever n is.
+# Outcome i is column i if a uniform draw falls below prob[i], otherwise alias[i].
+# Built with Vose's stable pairing of under- and over-full columns.
+
+import random
+
+import numpy as np
+
+def alias_columns(weights):
+    # (prob, alias) arrays for the given non-negative weights
+    weights = np.asarray(weights, dtype=np.float64)
+    n = len(weights)
+    if n == 0 or (weights < 0).any() or not weights.sum() > 0:
+        raise ValueError("alias table weights must be non-negative with a positive sum")
+    scaled = weights * (n / weights.sum())
+    prob = np.ones(n)
+    alias = np.arange(n)
+    small = [i for i in range(n) if scaled[i] < 1]
+    large = [i for i in range(n) if scaled[i] >= 1]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1 - scaled[s]
+        if scaled[l] < 1:
+            small.append(l)
+        else:
+            large.append(l)
+    return prob, alias  # columns left in either list are full up to rounding, prob 1
+
+class AliasTable:
+    def __init__(self, weights):
+        self.prob, self.alias = alias_columns(weights)
+        self.n = len(self.prob)
+        self.prob_list = self.prob.tolist()  # plain lists are faster to index from python
+        self.alias_list = self.alias.tolist()
+
+    def sample(self, rand=random):
+        # one outcome from the random module (or a random.Random)
+        column = rand.randrange(self.n)
+        if rand.random() < self.prob_list[column]:
+            return column
+        return self.alias_list[column]
@@ -0,0 +1,324 @@
+# bench.py
+# October 2026.
+# Benchmarks of the simulation hot paths, with a stored baseline and equivalence checks.
+# Each case times one hot path at one scale and reports its throughput (calls, replicates,
+# trials or simulations per second, from the median of repeated runs) and its peak memory
+# (tracemalloc, which also sees NumPy arrays, measured on a separate run).  make_replicate
+# cases simulate BENCH_YEARS years so the largest scales finish; scales whose NumPy
+# working set is over BENCH_MEMORY_MB are skipped.
+# Results are saved as JSON with the Python and NumPy versions, and can be compared with a
+# baseline saved the same way: a case whose rate dropped by more than the threshold is a
+# regression and the run exits with status 1.
+# --check runs every backend on the same small model and compares the distributions of
+# sampled crop allele frequencies with those of the original string model (baseline.py) by
+# two-sample Kolmogorov-Smirnov tests.
+#     python bench.py --out base.json
+#     python bench.py --baseline base.json --threshold 0.1
+#     python bench.py --scale full --only make_replicate --check
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import baseline
+import engine
+import shared_calc
+import sweep
+
+BENCH_YEARS = 5  # years simulated per replicate by the make_replicate cases
+BENCH_GENE_FLOW = [0, 2]
+BENCH_MEMORY_MB = 2048  # NumPy cases needing more working memory than this are skipped
+MIN_SECONDS = 0.5  # each case repeats until its timed runs add up to this
+REGRESSION = 0.2  # default threshold: a rate below (1 - REGRESSION) x the baseline rate fails
+SCALES = {
+    "quick": {"npop": [100, 1000], "loci": [100, 1000], "batch": [1, 10, 100]},
+    "full": {"npop": [100, 1000, 10000], "loci": [100, 1000, 10000], "batch": [1, 10, 100, 1000]},
+}
+BACKENDS = ("python", "numpy", "pedigree", "tracts")
+CHECK_MODEL = {"NPOP": 50, "LG_COUNT": 4, "LOCI_PER_LG": 50, "YEARS": 10, "GENE_FLOW_LIST": [0, 3],
+               "F1_RATE": 0.1, "SAMPLE_SIZE": 20}  # small model the equivalence checks run every backend on
+CHECK_REPLICATES = 400  # replicates per backend in the equivalence checks
+KS_ALPHA = 0.001  # a check fails when its KS p-value is below this
+
+def script(name, **overrides):
+    # maxdiff.py or cropwild2.py with its defaults and the given constants
+    overrides.setdefault("YEARS", BENCH_YEARS)
+    overrides.setdefault("GENE_FLOW_LIST", BENCH_GENE_FLOW)
+    if name == "cropwild2":
+        overrides.setdefault("OUTPUT_POLICY", "never")
+    return sweep.load_script(name, overrides)
+
+def random_individual(module, rand):
+    # a polymorphic bitmask individual, so recombine() never takes its equal-homolog shortcut
+    return [[rand.getrandbits(module.LOCI_PER_LG), rand.getrandbits(module.LOCI_PER_LG)]
+            for i in range(module.LG_COUNT)]
+
+def numpy_fits(npop, loci, count=1):
+    params = engine.model_params(npop, 17, loci, BENCH_YEARS, BENCH_GENE_FLOW, 0.05)
+    return count * engine.replicate_bytes(params) <= BENCH_MEMORY_MB * 2**20
+
+# Each case yields (name, scale, unit, items per run, run) and does its setup before
+# yielding, so only run() is timed.
+
+def recombine_cases(scales):
+    for loci in scales["loci"]:
+        module = script("maxdiff", LOCI_PER_LG=loci, BACKEND="python")
+        rand = random.Random(1)
+        individual = random_individual(module, rand)
+        child = module.init_chromos()
+        def run(module=module, individual=individual, child=child):
+            for k in range(1000):
+                module.recombine(individual, child, k & 1)
+        yield "recombine", {"loci": loci}, "calls/s", 1000, run
+
+def reproduce_cases(scales):
+    for npop in scales["npop"]:
+        for loci in scales["loci"]:
+            module = script("maxdiff", NPOP=npop, LOCI_PER_LG=loci, BACKEND="python")
+            rand = random.Random(1)
+            population = [random_individual(module, rand) for k in range(npop)]
+            child = module.init_chromos()
+            def run(module=module, population=population, child=child):
+                for k in range(1000):
+                    module.reproduce(population, child)
+            yield "reproduce", {"npop": npop, "loci": loci}, "calls/s", 1000, run
+
+def make_replicate_cases(scales):
+    for backend in BACKENDS:
+        for npop in scales["npop"]:
+            for loci in scales["loci"]:
+                if backend == "numpy" and not numpy_fits(npop, loci):
+                    continue
+                module = script("maxdiff", NPOP=npop, LOCI_PER_LG=loci, BACKEND=backend)
+                yield "make_replicate", {"backend": backend, "npop": npop, "loci": loci}, "replicates/s", 1, \
+                    module.make_replicate
+
+def batch_cases(scales):
+    for batch in scales["batch"]:
+        if not numpy_fits(100, 100, batch):
+            continue
+        params = engine.model_params(100, 17, 100, BENCH_YEARS, BENCH_GENE_FLOW, 0.05)
+        rng = np.random.default_rng(1)
+        def run(params=params, batch=batch, rng=rng):
+            engine.make_replicates(params, batch, rng)
+        yield "make_replicates", {"batch": batch}, "replicates/s", batch, run
+
+def trial_stats_cases(scales):
+    for loci in scales["loci"]:
+        module = script("cropwild2", LOCI_PER_LG=loci)
+        trials = 100
+        counts = np.random.default_rng(1).integers(0, 2 * module.SAMPLE_SIZE + 1,
+                                                   (trials, module.REPLICATES, module.LG_COUNT, loci))
+        def run(module=module, counts=counts):
+            module.trial_stats(counts)
+        yield "trial_stats", {"loci": loci}, "trials/s", trials, run
+
+def output_genotypes_cases(scales):
+    for npop in scales["npop"]:
+        for loci in scales["loci"]:
+            if not numpy_fits(npop, loci):
+                continue
+            module = script("cropwild2", NPOP=npop, LOCI_PER_LG=loci)
+            population = module.make_replicate()
+            path = os.path.join(tempfile.gettempdir(), "bench_genotypes_%d.txt" % os.getpid())
+            def run(module=module, population=population, path=path):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    module.output_genotypes(population, path)
+                os.remove(path)
+            yield "output_genotypes", {"npop": npop, "loci": loci}, "replicates/s", 1, run
+
+def get_share_cases(scales):
+    for sims in (10**4, 10**5):
+        rng = np.random.default_rng(1)
+        def run(sims=sims, rng=rng):
+            shared_calc.get_share([59, 148, 98], 23391, sims, rng)
+        yield "get_share", {"sims": sims}, "sims/s", sims, run
+
+CASES = {
+    "recombine": recombine_cases,
+    "reproduce": reproduce_cases,
+    "make_replicate": make_replicate_cases,
+    "make_replicates": batch_cases,
+    "trial_stats": trial_stats_cases,
+    "output_genotypes": output_genotypes_cases,
+    "get_share": get_share_cases,
+}
+
+def case_key(name, scale):
+    return name + " " + " ".join("%s=%s" % item for item in scale.items())
+
+def measure(run, items):
+    gc.collect()
+    tracemalloc.start()
+    run()  # also warms caches
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    times = []
+    while not times or sum(times) < MIN_SECONDS:
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    seconds = statistics.median(times)
+    return {"seconds": seconds, "rate": items / seconds, "peak_mb": peak / 2**20, "repeats": len(times)}
+
+def run_benchmarks(scale, only=None):
+    results = {}
+    for name, cases in CASES.items():
+        if only and name not in only:
+            continue
+        for case, params, unit, items, run in cases(SCALES[scale]):
+            result = dict(measure(run, items), unit=unit)
+            results[case_key(case, params)] = result
+            print("%-60s %12.4g %-13s %8.1f MB" % (case_key(case, params), result["rate"], unit, result["peak_mb"]))
+    return results
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def compare(results, baseline, threshold):
+    # keys of the cases slower than (1 - threshold) x their baseline rate
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratio = result["rate"] / baseline[key]["rate"]
+        flag = ""
+        if ratio < 1 - threshold:
+            regressions.append(key)
+            flag = "REGRESSION"
+        print("%-60s %6.2fx baseline %s" % (key, ratio, flag))
+    return regressions
+
+def ks_2samp(a, b):
+    # two-sample Kolmogorov-Smirnov statistic D and its asymptotic p-value
+    a = np.sort(np.ravel(a))
+    b = np.sort(np.ravel(b))
+    values = np.concatenate([a, b])
+    d = np.abs(np.searchsorted(a, values, side="right") / len(a)
+               - np.searchsorted(b, values, side="right") / len(b)).max()
+    n = len(a) * len(b) / (len(a) + len(b))
+    lam = (math.sqrt(n) + 0.12 + 0.11 / math.sqrt(n)) * d
+    if lam < 0.2:
+        return d, 1.0
+    p = 2 * sum((-1)**(k - 1) * math.exp(-2 * k * k * lam * lam) for k in range(1, 101))
+    return d, min(1.0, max(0.0, p))
+
+def baseline_genomes(replicates, seed):
+    # sampled_genomes() of the original string model, which has no genetic maps or selection
+    if CHECK_MODEL.get("GENETIC_MAP") is not None or CHECK_MODEL.get("SELECTION") is not None:
+        raise ValueError("the baseline model has no genetic maps or selection")
+    for name, value in CHECK_MODEL.items():
+        setattr(baseline, name, value)
+    random.seed(seed)
+    genomes = []
+    for rep in range(replicates):
+        population = baseline.make_replicate()[:baseline.SAMPLE_SIZE]
+        genomes.append([[[[int(allele) for allele in homolog] for homolog in chromo] for chromo in individual]
+                        for individual in population])
+    return np.asarray(genomes, dtype=np.uint8)
+
+def sampled_genomes(backend, replicates, seed):
+    # the SAMPLE_SIZE sampled individuals of each replicate as [replicate][individual][LG][homolog][locus]
+    if backend == "baseline":
+        return baseline_genomes(replicates, seed)
+    module = sweep.load_script("maxdiff", dict(CHECK_MODEL, BACKEND=backend))
+    loci = module.LOCI_PER_LG
+    if backend in ("numpy", "pedigree"):
+        return module.make_batch(module.model_params(), replicates, np.random.default_rng(seed))[:, :module.SAMPLE_SIZE]
+    random.seed(seed)
+    genomes = []
+    for rep in range(replicates):
+        population = module.make_replicate()
+        if backend == "python":
+            population = [[[[(bits >> j) & 1 for j in range(loci)] for bits in chromo] for chromo in individual]
+                          for individual in population[:module.SAMPLE_SIZE]]
+        genomes.append(np.asarray(population, dtype=np.uint8)[:module.SAMPLE_SIZE])
+    return np.asarray(genomes)
+
+def frequency_samples(genomes):
+    # the allele-frequency distributions compared between backends
+    freqs = genomes.mean(axis=(1, 3))  # [replicate][LG][locus]
+    loci = freqs.shape[-1]
+    return {
+        "LG crop frequency": freqs.mean(axis=-1),
+        "highest locus frequency": freqs.max(axis=(1, 2)),
+        "first locus frequency": freqs[:, :, 0],
+        "middle locus frequency": freqs[:, :, loci // 2],
+    }
+
+def check_equivalence(replicates=CHECK_REPLICATES):
+    # True when no backend's distributions differ from the original model's at KS_ALPHA
+    reference = frequency_samples(sampled_genomes("baseline", replicates, 1))
+    passed = True
+    for backend in BACKENDS:
+        samples = frequency_samples(sampled_genomes(backend, replicates, 2))
+        for name, values in samples.items():
+            d, p = ks_2samp(reference[name], values)
+            flag = ""
+            if p < KS_ALPHA:
+                passed = False
+                flag = "DIFFERS"
+            print("%-9s %-24s KS D %.4f p %.4f %s" % (backend, name, d, p, flag))
+    return passed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="quick", help="scales to run (default quick)")
+    parser.add_argument("--only", default=None, help="comma-separated cases to run: " + ", ".join(CASES))
+    parser.add_argument("--out", default=None, help="save the results as JSON here")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION,
+                        help="fractional slowdown counted as a regression (default %g)" % REGRESSION)
+    parser.add_argument("--check", action="store_true", help="also check every backend against the original model (baseline.py)")
+    parser.add_argument("--check-replicates", type=int, default=CHECK_REPLICATES,
+                        help="replicates per backend for --check (default %d)" % CHECK_REPLICATES)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    only = None
+    if args.only is not None:
+        only = args.only.split(",")
+        unknown = [name for name in only if name not in CASES]
+        if unknown:
+            sys.exit("unknown cases: " + ", ".join(unknown))
+    results = run_benchmarks(args.scale, only)
+    if args.out is not None:
+        with open(args.out, "w") as outfile:
+            json.dump({"environment": environment(), "scale": args.scale, "results": results}, outfile, indent=1)
+    failed = False
+    if args.baseline is not None:
+        with open(args.baseline) as basefile:
+            baseline = json.load(basefile)
+        print("baseline from", baseline["environment"])
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(len(regressions), "regressions")
+            failed = True
+    if args.check and not check_equivalence(args.check_replicates):
+        print("backends differ from the python backend")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
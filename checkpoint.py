@@ -0,0 +1,72 @@
+# checkpoint.py
+# October 2026.
+# Periodic checkpoints of a Monte Carlo run, so a preempted run can resume where it stopped.
+# Trial t always draws from the RNG stream of (master seed, t) (parallel.py), so the master
+# seed and the number of finished trials are the whole RNG state; with the quantile
+# accumulators of the finished trials they make a checkpoint of a few kilobytes.  A resumed
+# run gives the same output as one that was never interrupted.
+# Checkpoints are JSON, written to a temporary file and moved into place with os.replace(),
+# so a crash during a save leaves the previous checkpoint intact.  A checkpoint also records
+# the model (parameters, backend, sample) and refuses to resume a run with a different one;
+# a sync function, such as ReplicateStore.sync, runs before every save so files the run
+# appends to are on disk before the checkpoint counts their trials.
+
+import json
+import os
+import time
+
+import quantiles
+
+CHECKPOINT_SECONDS = 300  # default time between checkpoints
+
+def save_checkpoint(path, script, master_seed, trials, next_trial, accumulators, model=None):
+    state = {
+        "script": script,
+        "model": model,  # JSON-serializable dict of everything besides the seed that determines a trial
+        "master_seed": master_seed,
+        "trials": trials,
+        "next_trial": next_trial,  # trials 0..next_trial-1 are in the accumulators
+        "stats": {name: accumulator.to_dict() for name, accumulator in accumulators.items()},
+    }
+    temppath = path + ".tmp"
+    with open(temppath, "w") as tempfile:
+        json.dump(state, tempfile)
+        tempfile.flush()
+        os.fsync(tempfile.fileno())
+    os.replace(temppath, path)
+
+def load_checkpoint(path, script, trials, model=None):
+    # (master seed, next trial, accumulators) of a checkpoint of the same script, TRIALS and model
+    with open(path) as checkfile:
+        state = json.load(checkfile)
+    if state["script"] != script or state["trials"] != trials:
+        raise ValueError("%s is a checkpoint of %s with %d trials, not %s with %d"
+                         % (path, state["script"], state["trials"], script, trials))
+    model = json.loads(json.dumps(model))  # tuples become lists, as in the file
+    if state.get("model") != model:
+        raise ValueError("%s is a checkpoint of a different model: %s, not %s" % (path, state.get("model"), model))
+    accumulators = {name: quantiles.QuantileAccumulator.from_dict(data) for name, data in state["stats"].items()}
+    return state["master_seed"], state["next_trial"], accumulators
+
+class Checkpointer:
+    # saves at most once every interval seconds; path None disables checkpoints
+    def __init__(self, path, script, master_seed, trials, interval=CHECKPOINT_SECONDS, model=None, sync=None):
+        self.path = path
+        self.script = script
+        self.master_seed = master_seed
+        self.trials = trials
+        self.interval = interval
+        self.model = model
+        self.sync = sync  # called before every save
+        self.last_save = time.monotonic()
+
+    def save(self, next_trial, accumulators):
+        if self.path is not None:
+            if self.sync is not None:
+                self.sync()
+            save_checkpoint(self.path, self.script, self.master_seed, self.trials, next_trial, accumulators, self.model)
+        self.last_save = time.monotonic()
+
+    def maybe_save(self, next_trial, accumulators):
+        if time.monotonic() - self.last_save >= self.interval:
+            self.save(next_trial, accumulators)
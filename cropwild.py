@@ -1,117 +1,85 @@
 # cropwild.py
 # June 2022.  
 # Model drift, recombination, gene flow to create null model for PCadapt.
+# Homologs are IDs into a hapool.HaplotypePool, so each distinct chromosome is stored once.
 
 
 import random
-import copy
+
+import genowriter
+import hapool
 
 LOCI_PER_LG = 100
 NPOP = 1000
 LG_COUNT = 17
+GENOTYPE_FILE = "pcatest100.txt"  # genotype matrix for pcadapt
+GENOTYPE_FORMAT = "text"  # "text", "plink" (.bed/.bim/.fam next to GENOTYPE_FILE) or "both"
 
-def init_wildpop():
-    population = []
-    for i in range(NPOP):
-        individual = init_chromos()
-        population.append(individual)
-    return population
-
-def init_chromos():
-    individual = []
-    for i in range(LG_COUNT):
-        gstring = "0" * LOCI_PER_LG
-        hstring = "0" * LOCI_PER_LG
-        chromo = [gstring, hstring]
-        individual.append(chromo)
-    return individual
+def init_wildpop(pool):
+    return hapool.new_population(pool, NPOP, LG_COUNT)  # individuals initially have no crop SNPs, only wild
 
-def recombine(individual):
-    gamete = []
+def recombine(pool, individual, child, homolog):  # write a recombinant gamete into one homolog of child
     for i in range(LG_COUNT):
-        gstring = individual[i][0]
-        hstring = individual[i][1]
+        gid = individual[2 * i]
+        hid = individual[2 * i + 1]
         rpoint = random.randrange(1,LOCI_PER_LG)
-        g1 = gstring[0:rpoint] + hstring[rpoint:]
-        g2 = hstring[0:rpoint] + gstring[rpoint:]
         x = random.random()
         if x < .25:
-            gamete.append(g1)
+            child[2 * i + homolog] = pool.crossover(gid, hid, rpoint)
         elif x < .5:
-            gamete.append(g2)
+            child[2 * i + homolog] = pool.crossover(hid, gid, rpoint)
         elif x < .75:
-            gamete.append(gstring)
+            child[2 * i + homolog] = gid
         else:
-            gamete.append(hstring)
-    return gamete
+            child[2 * i + homolog] = hid
 
-def reproduce(population):
+def reproduce(pool, population, child):
     x = random.randrange(0,NPOP)
     y = random.randrange(0, NPOP)
-    g1 = recombine(population[x])
-    g2 = recombine(population[y])
-    nextgen = []
-    for i in range(LG_COUNT):
-        chromo = [g1[i], g2[i]]
-        nextgen.append(chromo)
-    return nextgen
+    recombine(pool, population[x], child, 0)
+    recombine(pool, population[y], child, 1)
 
-def crop_pollen():
-    gamete = []
+def crop_pollen(pool, child):
+    crop = pool.intern((1 << LOCI_PER_LG) - 1)  # crop pollen has only crop alleles
     for i in range(LG_COUNT):
-        gstring = "1" * LOCI_PER_LG
-        gamete.append(gstring)
-    return gamete
+        child[2 * i + 1] = crop
 
-def geneflow(population):
+def geneflow(pool, population, child):
     x = random.randrange(0,NPOP)
-    g1 = recombine(population[x])
-    g2 = crop_pollen()
-    nextgen = []
-    for i in range(LG_COUNT):
-        chromo = [g1[i], g2[i]]
-        nextgen.append(chromo)
-    return nextgen
+    recombine(pool, population[x], child, 0)
+    crop_pollen(pool, child)
 
 def main():
-    population = init_wildpop()
+    pool = hapool.HaplotypePool()
+    population = init_wildpop(pool)
+    newpop = init_wildpop(pool)  # second buffer, filled in place each year
     for year in range(25):
         mctr = 0
         if year == 0 or year == 4 or year == 7:
             mctr = 5
-        newpop = []
         for i in range(mctr):
-            nextgen = geneflow(population)
-            newpop.append(nextgen)
-        for i in range(NPOP - mctr):
-            nextgen = reproduce(population)
-            newpop.append(nextgen)
-        population = copy.deepcopy(newpop)
+            geneflow(pool, population, newpop[i])
+        for i in range(mctr, NPOP):
+            reproduce(pool, population, newpop[i])
+        population, newpop = newpop, population  # swap buffers, last year's population is overwritten next year
+        pool.collect(population)  # newpop is overwritten before it is read again
    
     # get ending allele freqs
     freqdict = {}
     freqlist = []
-    outstring = ""
+    writer = genowriter.GenotypeWriter(GENOTYPE_FILE, LOCI_PER_LG, GENOTYPE_FORMAT)
     for i in range(LG_COUNT):
+        chromos = hapool.lg_bits(pool, population, i)
         for j in range(LOCI_PER_LG):
             indgenos = []
-            for k in range(NPOP):
-                cropct = int(population[k][i][0][j]) + int(population[k][i][1][j])
+            for gbits, hbits in chromos:
+                cropct = ((gbits >> j) & 1) + ((hbits >> j) & 1)
                 indgenos.append(cropct)
             cropfreq = sum(indgenos) / (NPOP * 2)
             #print("LG, Locus, freq", i, j, cropfreq)
             freqlist.append(cropfreq)
-            first = True
-            for z in range(len(indgenos)):
-                if first:
-                    outstring = outstring + str(indgenos[z])
-                    first = False
-                else:
-                    outstring = outstring +" " + str(indgenos[z])
-            outstring = outstring + "\n"
-    outfile = open("/home/baacer01/popgen/pcatest100.txt", "w")
-    outfile.write(outstring)
-    outfile.close()
+            writer.writerow(indgenos)
+    writer.close()
     freqlist.sort()
     bound95 = int(LG_COUNT*LOCI_PER_LG*.95)
     print("95pct upper CI for crop freq", freqlist[bound95])
@@ -10,191 +10,396 @@
 
 
 
+import argparse
+import os
 import random
-import copy
 import statistics
 import math
 
+import numpy as np
+
+import alias
+import checkpoint
+import engine
+import genowriter
+import instrument
+import parallel
+import pedigree
+import quantiles
+import replicache
+import simstats
+import tracts
+
 LOCI_PER_LG = 100
 NPOP = 100
 LG_COUNT = 17
+YEARS = 25
+GENE_FLOW_LIST = [0, 4, 7]
+F1_RATE = 0.05  # 5 F1s per gene flow year at NPOP = 100
+GENETIC_MAP = None  # genetic map file for Poisson crossovers at map rates (genmap.py), None for one uniform crossover per LG
+SELECTION = None  # regions selected against crop alleles, [(LG, first locus, stop locus, s)] from 0 (fitness.py), None for drift only
+TRIALS = 10000  # number of F statistics in the null distribution
+REPLICATES = 22  # populations per trial
+SAMPLE_SIZE = 20  # individuals genotyped per population
+BACKEND = "numpy"  # "numpy" for the whole-generation engine in engine.py, "pedigree" to rebuild only the sampled
+                   # individuals from the pedigree (pedigree.py), "tracts" for crop/wild tract chromosomes
+                   # (tracts.py), "python" for per-individual reproduce()
+BATCH_MEMORY_MB = 1024  # RAM the numpy backend may use for one batch of replicates
+REPORT_TRACTS = False  # print the sampled crop tract counts and lengths of every tracts backend replicate
+STAT_NAMES = ("fstat", "maxdiff")  # what run_trials() returns per trial, in order
+CACHE_DIR = None  # directory caching each trial's sampled crop allele counts (replicache.py), None for no cache
+CACHE_MAX_MB = 4096  # size cap of CACHE_DIR, least recently used trials are evicted first
+STOP_TARGETS = [("fstat", .975), ("maxdiff", .975)]  # quantiles whose intervals --tolerance checks
+GENOTYPE_FILE = "pcatest100.txt"  # genotype matrix written by output_genotypes()
+GENOTYPE_FORMAT = "text"  # "text", "plink" (.bed/.bim/.fam next to GENOTYPE_FILE) or "both"
+OUTPUT_POLICY = "final"  # genotype dumps: "never", "every" OUTPUT_EVERY-th replicate, or "final" replicate of the run only
+OUTPUT_EVERY = 1000  # replicates between dumps for OUTPUT_POLICY = "every"
+OUTPUT_IN_BACKGROUND = False  # hand dumps to a writer thread; dumps arriving while two are queued are dropped
 
 def init_wildpop():
     population = []
     for i in range(NPOP):
         individual = init_chromos()
         population.append(individual)
-    return population  # [individual][LG][homolog][locus]
+    return population  # [individual][LG][homolog], homolog is an int with bit j set if locus j is crop
 
 def init_chromos():
     individual = []
     for i in range(LG_COUNT):
-        gstring = "0" * LOCI_PER_LG
-        hstring = "0" * LOCI_PER_LG
-        chromo = [gstring, hstring]
+        gbits = 0
+        hbits = 0
+        chromo = [gbits, hbits]
         individual.append(chromo)
     return individual
 
-def recombine(individual):
-    gamete = []
+def recombine(individual, child, homolog, gmap=None):  # write a recombinant gamete into one homolog of child, crossovers from gmap if given
     for i in range(LG_COUNT):
-        gstring = individual[i][0]
-        hstring = individual[i][1]
+        gbits = individual[i][0]
+        hbits = individual[i][1]
+        if gbits == hbits:  # every gamete is the same, no draws needed
+            child[i][homolog] = gbits
+            continue
+        if gmap is not None:
+            child[i][homolog] = gmap.recombine_bits(i, gbits, hbits)
+            continue
         rpoint = random.randrange(1,LOCI_PER_LG)
-        g1 = gstring[0:rpoint] + hstring[rpoint:]
-        g2 = hstring[0:rpoint] + gstring[rpoint:]
+        lowmask = (1 << rpoint) - 1  # loci below the crossover point
+        g1 = (gbits & lowmask) | (hbits & ~lowmask)
+        g2 = (hbits & lowmask) | (gbits & ~lowmask)
         x = random.random()
         if x < .25:
-            gamete.append(g1)
+            child[i][homolog] = g1
         elif x < .5:
-            gamete.append(g2)
+            child[i][homolog] = g2
         elif x < .75:
-            gamete.append(gstring)
+            child[i][homolog] = gbits
         else:
-            gamete.append(hstring)
-    return gamete
-
-def reproduce(population):
-    x = random.randrange(0,NPOP)
-    y = random.randrange(0, NPOP)
-    g1 = recombine(population[x])
-    g2 = recombine(population[y])
-    nextgen = []
-    for i in range(LG_COUNT):
-        chromo = [g1[i], g2[i]]
-        nextgen.append(chromo)
-    return nextgen
+            child[i][homolog] = hbits
 
-def crop_pollen():
-    gamete = []
-    for i in range(LG_COUNT):
-        gstring = "1" * LOCI_PER_LG
-        gamete.append(gstring)
-    return gamete
-
-def geneflow(population):
-    x = random.randrange(0,NPOP)
-    g1 = recombine(population[x])
-    g2 = crop_pollen()
-    nextgen = []
+def pick_parent(parents):  # uniform, or in proportion to fitness from an alias table
+    if parents is None:
+        return random.randrange(0, NPOP)
+    return parents.sample()
+
+def reproduce(population, child, parents=None, gmap=None):
+    x = pick_parent(parents)
+    y = pick_parent(parents)
+    recombine(population[x], child, 0, gmap)
+    recombine(population[y], child, 1, gmap)
+
+def crop_pollen(child):
     for i in range(LG_COUNT):
-        chromo = [g1[i], g2[i]]
-        nextgen.append(chromo)
-    return nextgen
+        child[i][1] = (1 << LOCI_PER_LG) - 1
+
+def geneflow(population, child, parents=None, gmap=None):
+    x = pick_parent(parents)
+    recombine(population[x], child, 0, gmap)
+    crop_pollen(child)
+
+def absorbed(population):
+    # True when every homolog of every LG is the same, so later years cannot change the population
+    first = population[0]
+    return all(g == h for g, h in first) and all(individual == first for individual in population)
+
+def model_params():
+    return engine.model_params(NPOP, LG_COUNT, LOCI_PER_LG, YEARS, GENE_FLOW_LIST, F1_RATE, GENETIC_MAP, SELECTION)
+
+def make_batch(params, count, rng=None):
+    if BACKEND == "pedigree":
+        return pedigree.make_samples(params, count, SAMPLE_SIZE, rng)  # only the sampled individuals
+    return engine.make_replicates(params, count, rng)
 
 def make_replicate():
+    if BACKEND == "tracts":
+        population = tracts.make_replicate(model_params())
+        if REPORT_TRACTS:
+            lengths, per_chromosome = tracts.tract_distributions(population, SAMPLE_SIZE)
+            if lengths:
+                print("crop tracts per homolog, mean tract length (LG fraction): ", statistics.mean(per_chromosome), statistics.mean(lengths))
+        return tracts.materialize(population, tracts.snp_map(LOCI_PER_LG))
+    if BACKEND != "python":
+        return make_batch(model_params(), 1)[0]
     population = init_wildpop()
-    for year in range(25):
+    newpop = init_wildpop()  # second buffer, filled in place each year
+    last_flow = max(GENE_FLOW_LIST, default=-1)
+    params = model_params()
+    gmap = engine.genetic_map(params)  # None for one uniform crossover per LG
+    fmodel = engine.fitness_model(params)  # None for drift only
+    fitnesses = [1.0] * NPOP  # everyone starts wild
+    newfitnesses = [1.0] * NPOP
+    for year in range(YEARS):
+        if year > last_flow and absorbed(population):
+            break
         mctr = 0
-        if year == 0 or year == 4 or year == 7:
-            mctr = 5
-        newpop = []
+        if year in GENE_FLOW_LIST:
+            mctr = int(NPOP * F1_RATE)
+        parents = None
+        if fmodel is not None:
+            parents = alias.AliasTable(fitnesses)  # built once, each parent draw is O(1)
         for i in range(mctr):
-            nextgen = geneflow(population)
-            newpop.append(nextgen)
-        for i in range(NPOP - mctr):
-            nextgen = reproduce(population)
-            newpop.append(nextgen)
-        population = copy.deepcopy(newpop)
+            geneflow(population, newpop[i], parents, gmap)
+        for i in range(mctr, NPOP):
+            reproduce(population, newpop[i], parents, gmap)
+        if fmodel is not None:
+            for i in range(NPOP):
+                newfitnesses[i] = fmodel.fitness_bits(newpop[i])
+            fitnesses, newfitnesses = newfitnesses, fitnesses
+        if instrument.ENABLED:
+            instrument.count("generations")
+            instrument.count("gametes", 2 * NPOP - mctr)
+            instrument.count("recombinations", (2 * NPOP - mctr) * LG_COUNT)
+        population, newpop = newpop, population  # swap buffers, last year's population is overwritten next year
     return population
 
-def output_genotypes(population):
+def iter_trial_reps(master_seed, start, stop):
+    # yields the REPLICATES populations of trials start..stop-1, each trial from its own
+    # RNG stream; the array backends simulate as many whole trials per batch as fit in BATCH_MEMORY_MB
+    # and engine.MAX_BATCH_REPLICATES, and at least one
+    if BACKEND in ("numpy", "pedigree"):
+        params = model_params()
+        batch_trials = max(1, engine.batch_size_for(params, BATCH_MEMORY_MB * 2**20) // REPLICATES)
+        for first in range(start, stop, batch_trials):
+            rngs = []
+            for trial in range(first, min(first + batch_trials, stop)):
+                rngs.append(parallel.trial_rng(master_seed, trial))
+            with instrument.phase("simulate"):
+                batch = make_batch(params, len(rngs) * REPLICATES, rngs)
+            for replist in batch.reshape((-1, REPLICATES) + batch.shape[1:]):
+                yield replist
+        return
+    for trial in range(start, stop):
+        random.seed(parallel.trial_seed(master_seed, trial))
+        replist = []
+        with instrument.phase("simulate"):
+            for rep in range(REPLICATES):
+                replist.append(make_replicate())
+        yield replist
+
+def output_genotypes(population, path=GENOTYPE_FILE):
     # get ending allele freqs
     freqlist = []
-    outstring = ""
     cresistct = 0
+    writer = genowriter.GenotypeWriter(path, LOCI_PER_LG, GENOTYPE_FORMAT)
+    if BACKEND != "python":
+        genos = engine.genotype_matrix(population)
     for i in range(LG_COUNT):
         for j in range(LOCI_PER_LG):
-            indgenos = []
-            for k in range(NPOP):
-                cropct = int(population[k][i][0][j]) + int(population[k][i][1][j])
-                indgenos.append(cropct)
+            if BACKEND != "python":
+                indgenos = genos[i, j].tolist()
+            else:
+                indgenos = []
+                for k in range(NPOP):
+                    cropct = ((population[k][i][0] >> j) & 1) + ((population[k][i][1] >> j) & 1)
+                    indgenos.append(cropct)
             cropfreq = sum(indgenos) / (NPOP * 2)
             if cropfreq < .1:
                 cresistct += 1
             #print("LG, Locus, freq", i, j, cropfreq)
             freqlist.append(cropfreq)
-            first = True
-            for z in range(len(indgenos)):
-                if first:
-                    outstring = outstring + str(indgenos[z])
-                    first = False
-                else:
-                    outstring = outstring +" " + str(indgenos[z])
-            outstring = outstring + "\n"
-    outfile = open("/home/baacer01/popgen/pcatest100.txt", "w")
-    outfile.write(outstring)
-    outfile.close()
+            writer.writerow(indgenos)
+    writer.close()
+    instrument.count("bytes_written", writer.bytes_written)
     freqlist.sort()
     bound95 = int(LG_COUNT*LOCI_PER_LG*.95)
     print("95pct upper CI for crop freq", freqlist[bound95])
     print("crop resistant loci count, percent: ", cresistct, cresistct / (LG_COUNT*LOCI_PER_LG))
 
-def calc_lg_freqs(lgfreqdict, population):
-    for i in range(LG_COUNT):
-        croptot = 0
-        for j in range(LOCI_PER_LG):
-            for k in range(20):
-                cropct = int(population[k][i][0][j]) + int(population[k][i][1][j])
-                croptot = croptot + cropct
-        cropfreq = croptot / (20 * 2 * LOCI_PER_LG)
-        #print("LG, cropfreq: ", i, cropfreq)
-        lgfreqdict[i].append(cropfreq)
-    return lgfreqdict
-
-def anova(lgfreqdict):
-    lgmeanlist = []
-    lgvarlist = []
-    for i in range(LG_COUNT):
-        lmean = statistics.mean(lgfreqdict[i])
-        lvar = statistics.variance(lgfreqdict[i])
-        lgmeanlist.append(lmean)
-        lgvarlist.append(lvar)
-    tmean = statistics.mean(lgmeanlist)
-    ssg = 0
-    sse = 0
-    for i in range(LG_COUNT):
-        ssg = ssg + (tmean - lgmeanlist[i])**2
-        sse = sse + lgvarlist[i]*(21)
-    msg = ssg / 16
-    mse = sse / 357
-    fstat = msg / mse
-    return fstat
-
-def differ(lgfreqdict):
-    lgmeanlist = []
-    for i in range(LG_COUNT):
-        lmean = statistics.mean(lgfreqdict[i])
-        lgmeanlist.append(lmean)
-    maxmean = max(lgmeanlist)
-    minmean = min(lgmeanlist)
-    maxdiff = maxmean - minmean
-    return maxdiff
+def sample_counts(replist):
+    # crop allele counts of the sampled individuals as [replicate][LG][locus]
+    with instrument.phase("sample"):
+        if BACKEND != "python":
+            return engine.sample_crop_counts(np.asarray(replist), SAMPLE_SIZE)
+        # every sampled homolog's bitmask as little-endian bytes, unpacked to one bit per locus in one call
+        nbytes = (LOCI_PER_LG + 7) // 8
+        data = b"".join(hbits.to_bytes(nbytes, "little") for population in replist
+                        for individual in population[:SAMPLE_SIZE] for chromo in individual for hbits in chromo)
+        homologs = np.frombuffer(data, dtype=np.uint8).reshape(REPLICATES, SAMPLE_SIZE, LG_COUNT, 2, nbytes)
+        bits = np.unpackbits(homologs, axis=-1, bitorder="little")[..., :LOCI_PER_LG]
+        return bits.sum(axis=(1, 3), dtype=np.int64)
+
+def run_fields():  # everything besides the seed that determines a trial's counts
+    params = model_params()
+    fields = dict(params, backend=BACKEND, sample_size=SAMPLE_SIZE, replicates=REPLICATES)
+    if GENETIC_MAP is not None:  # the map file's contents, not just its path
+        fields["genetic_map_sha256"] = engine.genetic_map_digest(params)
+    return fields
+
+def iter_trial_counts(master_seed, start, stop, dumper=None):
+    # yields sample_counts() of trials start..stop-1, simulating only the trials missing from
+    # CACHE_DIR; only simulated trials dump genotypes
+    def simulate(first, stop):
+        for trial, replist in enumerate(iter_trial_reps(master_seed, first, stop), first):
+            for rep, population in enumerate(replist):
+                dump_genotypes(population, trial * REPLICATES + rep, dumper)
+            yield sample_counts(replist)
+    if CACHE_DIR is None:
+        yield from simulate(start, stop)
+        return
+    cache = replicache.open_cache(CACHE_DIR, CACHE_MAX_MB * 2**20)
+    fields = dict(run_fields(), script="cropwild2", master_seed=master_seed)
+    yield from replicache.iter_cached(cache, fields, start, stop, simulate)
+
+def lg_freqs(counts):
+    # sampled crop allele frequency of each LG as [trial][replicate][LG]
+    return counts.sum(axis=-1, dtype=np.int64) / (SAMPLE_SIZE * 2 * LOCI_PER_LG)
+
+def dump_genotypes(population, replicate, dumper=None):
+    # replicate counts populations over the whole run, trial * REPLICATES + rep
+    if OUTPUT_POLICY == "never" or BACKEND == "pedigree":  # the pedigree backend only rebuilds the sample
+        return
+    if OUTPUT_POLICY == "every":
+        if replicate % OUTPUT_EVERY != 0:
+            return
+        root, ext = os.path.splitext(GENOTYPE_FILE)
+        path = root + "_" + str(replicate) + ext
+    elif OUTPUT_POLICY == "final":  # dump_final() writes it once the run is over
+        return
+    else:
+        raise ValueError("OUTPUT_POLICY must be never, every or final, not %r" % OUTPUT_POLICY)
+    if dumper is not None:
+        dumper.submit(population, path)  # populations are never reused after their trial
+    else:
+        with instrument.phase("output"):
+            output_genotypes(population, path)
+
+def dump_final(master_seed, trial):
+    # OUTPUT_POLICY "final": reruns trial, the last one of the run, from its RNG stream and
+    # dumps its last replicate, so the file is written however the run ended
+    if OUTPUT_POLICY != "final" or BACKEND == "pedigree":
+        return
+    replist = next(iter_trial_reps(master_seed, trial, trial + 1))
+    with instrument.phase("output"):
+        output_genotypes(replist[-1], GENOTYPE_FILE)
+    print("genotypes of trial", trial, "replicate", REPLICATES - 1, "written to", GENOTYPE_FILE)
+
+def trial_stats(counts):
+    # (F, max LG difference) of each trial in counts [trial][replicate][LG][locus]
+    with instrument.phase("stats"):
+        freqs = lg_freqs(counts)
+        return list(zip(simstats.anova_f(freqs).tolist(), simstats.max_min_diff(freqs).tolist()))
+
+def trial_cost():  # relative work per trial, used by sweep.py to run cheap points first
+    return NPOP * LG_COUNT * LOCI_PER_LG * YEARS * REPLICATES
+
+def upper_rank(trials):  # rank of the reported upper 95% bound among the sorted trial statistics
+    return max(0, int(.975 * trials) - 1)
+
+def profile_run(master_seed, start, stop):
+    # run_trials() without CACHE_DIR or genotype dumps, so --profile-trial always simulates and writes nothing
+    return trial_stats(np.array([sample_counts(replist) for replist in iter_trial_reps(master_seed, start, stop)]))
+
+def run_trials(master_seed, start, stop):  # work unit for parallel.run_trials()
+    dumper = None
+    if OUTPUT_IN_BACKGROUND:
+        dumper = genowriter.BackgroundWriter(output_genotypes)
+    results = trial_stats(np.array(list(iter_trial_counts(master_seed, start, stop, dumper))))
+    if dumper is not None:
+        dumper.close()
+        if dumper.dropped:
+            print("genotype dumps dropped while the writer was busy: ", dumper.dropped)
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Null distribution of the between-LG F statistic.")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default 1)")
+    parser.add_argument("--seed", type=int, default=None, help="master seed (default: drawn from system entropy)")
+    parser.add_argument("--shard", default=None, help="save the F and diff distributions here, to merge runs with quantiles.py")
+    parser.add_argument("--checkpoint", default=None, help="file to checkpoint the finished trials to (default: no checkpoints)")
+    parser.add_argument("--checkpoint-every", type=float, default=checkpoint.CHECKPOINT_SECONDS,
+                        help="seconds between checkpoints (default %(default)s)")
+    parser.add_argument("--resume", action="store_true", help="continue from the --checkpoint file")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="stop once the 95%% interval of every STOP_TARGETS quantile is at most this wide; TRIALS is then the maximum"
+                             " and OUTPUT_POLICY \"final\" dumps the last trial used")
+    parser.add_argument("--metrics-every", type=float, default=None,
+                        help="report trial rate, ETA, phase times and counters every this many seconds (default: off)")
+    parser.add_argument("--metrics-file", default=None, help="write the metrics reports to this JSON file instead of printing them")
+    parser.add_argument("--profile-trial", type=int, default=None,
+                        help="rerun this trial (0 to TRIALS-1) under the sampling profiler first, bypassing CACHE_DIR and genotype dumps")
+    parser.add_argument("--profile-out", default=None, help="folded stacks of --profile-trial (default profile_<trial>.folded)")
+    args = parser.parse_args()
+    if args.profile_trial is not None and not 0 <= args.profile_trial < TRIALS:
+        parser.error("--profile-trial must be from 0 to TRIALS-1 = %d" % (TRIALS - 1))
+    if args.resume and args.checkpoint is None:
+        parser.error("--resume needs --checkpoint")
+    return args
 
 def main():
-    flist = []
-    difflist = []
+    args = parse_args()
+    start = 0
+    if args.resume:
+        master_seed, start, accumulators = checkpoint.load_checkpoint(args.checkpoint, "cropwild2", TRIALS, run_fields())
+        print("resuming at trial", start)
+        fstats = accumulators["fstat"]
+        diffs = accumulators["maxdiff"]
+    else:
+        master_seed = args.seed
+        if master_seed is None:
+            master_seed = parallel.new_master_seed()
+        fstats = quantiles.QuantileAccumulator()
+        diffs = quantiles.QuantileAccumulator()
+    print("master seed:", master_seed)
+    accumulators = {"fstat": fstats, "maxdiff": diffs}
+    checkpointer = checkpoint.Checkpointer(args.checkpoint, "cropwild2", master_seed, TRIALS, args.checkpoint_every,
+                                           run_fields())
+    if args.profile_trial is not None:
+        profile_out = args.profile_out or "profile_%d.folded" % args.profile_trial
+        instrument.profile_trial(profile_run, master_seed, args.profile_trial, profile_out)
+    progress = None
+    if args.metrics_every is not None or args.metrics_file is not None:
+        instrument.enable()
+        progress = instrument.Progress(TRIALS, start, REPLICATES, args.metrics_every or instrument.METRICS_SECONDS,
+                                       args.metrics_file)
     #outfile = open("/home/baacer01/popgen/LGintrog.txt", "w")
-    for trial in range(10000):
+    results = parallel.run_trials(run_trials, TRIALS, master_seed, args.workers, start)
+    for trial, (fstat, maxdiff) in enumerate(results, start):
         if trial % 10 == 0:
                 print("replicate: ", trial)
-        lgfreqdict = {}
-        for i in range(LG_COUNT):
-            lgfreqdict[i] = []
-        for rep in range(22):
-            population = make_replicate()
-            output_genotypes(population)
-            lgfreqdict = calc_lg_freqs(lgfreqdict, population)
-        fstat = anova(lgfreqdict)  
-        flist.append(fstat)    
-        maxdiff = differ(lgfreqdict)
-        difflist.append(maxdiff)
-    flist.sort()
-    difflist.sort()
-    print("95 CI for F: ", flist[9749])
-    print("max F", flist[9999])
-    print("95 CI for diff: ", difflist[9749])
-    print("max dif:f", difflist[9999])
+        fstats.add(fstat)    
+        diffs.add(maxdiff)
+        checkpointer.maybe_save(trial + 1, accumulators)
+        if progress is not None:
+            progress.update(trial + 1)
+        if args.tolerance is not None and (trial + 1) % parallel.CHUNK_TRIALS == 0:
+            if quantiles.converged(accumulators, STOP_TARGETS, args.tolerance):
+                break
+    results.close()  # cancels the chunks not started yet after an early stop
+    trials = fstats.count
+    if progress is not None:
+        progress.report(trials)
+    checkpointer.save(trials, accumulators)
+    if args.tolerance is not None:
+        print("trials used:", trials)
+        for name, q in STOP_TARGETS:
+            print(name, q, "quantile 95% interval width:", quantiles.interval_width(accumulators[name], q))
+    if args.shard is not None:
+        quantiles.save_shard(args.shard, accumulators)
+    dump_final(master_seed, trials - 1)
+    print("95 CI for F: ", fstats.order_statistic(upper_rank(trials)))
+    print("max F", fstats.order_statistic(trials-1))
+    print("95 CI for diff: ", diffs.order_statistic(upper_rank(trials)))
+    print("max dif:f", diffs.order_statistic(trials-1))
     #outfile.close()
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# engine.py
+# October 2026.
+# Whole-generation NumPy engine for the crop-wild drift model.
+# A population is a uint8 array [individual][LG][homolog][locus], 1 = crop allele.
+# Each generation is built in one pass: parents, crossover points and gamete choices
+# are drawn for every individual at once instead of one reproduce()/geneflow() call each.
+# Replicates can be batched: a batch is an array [replicate][individual][LG][homolog][locus]
+# and every replicate in it is advanced through all years by the same array operations.
+# Batches beyond a few replicates no longer pay off: the per-generation arrays fall out of
+# cache, so batch_size_for() stops at MAX_BATCH_REPLICATES whatever memory allows.
+# Drop-in backend for make_replicate() in maxdiff.py and cropwild2.py.
+# After the last gene-flow year no crop alleles arrive, so an LG whose homologs are all
+# identical in a replicate (crop allele lost or fixed at every locus) can never change
+# again.  make_replicates() stops building gametes for such LGs, and stops altogether once
+# every LG of every replicate is absorbed.  The random draws are made exactly as before,
+# so the results are bit-identical to building every gamete.
+# With a "genetic_map" in params, crossovers are drawn from the map (genmap.py) instead, and
+# with "selection" parents are drawn in proportion to their fitness (fitness.py).
+
+import functools
+
+import numpy as np
+
+import fitness
+import genmap
+import instrument
+
+RNG = np.random.default_rng()  # default generator when the caller does not pass one
+COMPACT_FRACTION = 0.25  # build gametes only for unabsorbed LGs once this share of LGs is absorbed
+MAX_BATCH_REPLICATES = 16  # largest batch batch_size_for() returns; 7-14 replicates ran fastest at the scripts' defaults
+
+# rng arguments take one Generator, or a list of Generators that each own an equal,
+# contiguous group of the replicate axis (one per trial).  Every group then draws only
+# from its own stream, so its replicates do not depend on what else is in the batch.
+
+def draw_integers(rng, low, high, size, dtype=np.int64):
+    # size[0] is the replicate axis
+    if isinstance(rng, np.random.Generator):
+        return rng.integers(low, high, size=size, dtype=dtype)
+    group_size = (size[0] // len(rng),) + tuple(size[1:])
+    return np.concatenate([group.integers(low, high, size=group_size, dtype=dtype) for group in rng])
+
+def draw_uniform(rng, size):
+    # uniforms on [0, 1), split over the replicate axis like draw_integers()
+    if isinstance(rng, np.random.Generator):
+        return rng.random(size=size)
+    group_size = (size[0] // len(rng),) + tuple(size[1:])
+    return np.concatenate([group.random(size=group_size) for group in rng])
+
+def model_params(npop, lg_count, loci_per_lg, years, gene_flow_list, f1_rate, genetic_map=None, selection=None):
+    params = {
+        "npop": npop,
+        "lg_count": lg_count,
+        "loci_per_lg": loci_per_lg,
+        "years": years,
+        "gene_flow_list": list(gene_flow_list),
+        "f1_rate": f1_rate,
+    }
+    if genetic_map is not None:
+        params["genetic_map"] = genetic_map  # map file path, see genmap.py
+    if selection is not None:
+        params["selection"] = [list(region) for region in selection]  # (LG, first, stop, s) regions, see fitness.py
+    return params
+
+def genetic_map(params):
+    # the loaded genmap.GeneticMap of params, None for one uniform crossover per LG
+    if params.get("genetic_map") is None:
+        return None
+    return genmap.load_map(params["genetic_map"], params["lg_count"], params["loci_per_lg"])
+
+def genetic_map_digest(params):
+    # genmap.file_digest() of params' map file, None for one uniform crossover per LG
+    if params.get("genetic_map") is None:
+        return None
+    return genmap.file_digest(params["genetic_map"])
+
+def fitness_model(params):
+    # the fitness.FitnessModel of params, None for drift only
+    if params.get("selection") is None:
+        return None
+    regions = tuple(tuple(region) for region in params["selection"])
+    return fitness.load_model(regions, params["lg_count"], params["loci_per_lg"])
+
+def init_wildpop(params, count=None):
+    shape = (params["npop"], params["lg_count"], 2, params["loci_per_lg"])
+    if count is not None:
+        shape = (count,) + shape
+    return np.zeros(shape, dtype=np.uint8)  # individuals initially have no crop SNPs, only wild
+
+@functools.lru_cache(maxsize=None)
+def below_table(loci):
+    # row r flags the loci below crossover point r
+    return (np.arange(loci) < np.arange(loci + 1)[:, np.newaxis]).view(np.uint8)
+
+def gamete_mask(loci, rpoint, choice):
+    # recombine() picks g1, g2, g or h with probability 1/4 each.  That is the same as
+    # choosing the homolog used below the crossover point and the one used from it on
+    # independently with probability 1/2.  Returns 1 where the gamete copies homolog h.
+    first = choice & 1
+    second = choice >> 1
+    use_h = below_table(loci)[rpoint]
+    use_h &= (first ^ second)[..., np.newaxis]
+    use_h ^= second[..., np.newaxis]
+    return use_h
+
+def make_gametes(populations, parents, rng, out, active=None, gmap=None):
+    # writes one recombinant gamete per entry of parents [replicate][gamete] into out [replicate][gamete][LG][locus];
+    # with active [replicate][LG], only the LGs flagged there are written; with a genetic
+    # map (genmap.py) the crossovers follow the map instead of recombine()
+    reps, count = parents.shape
+    lg_count = populations.shape[2]
+    loci = populations.shape[4]
+    if gmap is not None:
+        use_h = genmap.draw_masks(gmap, rng, (reps, count, lg_count))
+    else:
+        rpoint = draw_integers(rng, 1, loci, (reps, count, lg_count))
+        choice = draw_integers(rng, 0, 4, (reps, count, lg_count), np.uint8)
+    if active is None:
+        if gmap is None:
+            use_h = gamete_mask(loci, rpoint, choice)
+        parent_chromos = populations[np.arange(reps)[:, np.newaxis], parents]
+        gchromo = parent_chromos[:, :, :, 0]
+        np.bitwise_xor(gchromo, parent_chromos[:, :, :, 1], out=out)
+        out &= use_h
+        out ^= gchromo
+        return
+    rep, lg = np.nonzero(active)  # one entry per (replicate, LG) still to build
+    if gmap is None:
+        use_h = gamete_mask(loci, rpoint[rep, :, lg], choice[rep, :, lg])
+    else:
+        use_h = use_h[rep, :, lg]
+    parent_chromos = populations[rep[:, np.newaxis], parents[rep], lg[:, np.newaxis]]  # [entry][gamete][homolog][locus]
+    gchromo = parent_chromos[:, :, 0]
+    gametes = gchromo ^ parent_chromos[:, :, 1]
+    gametes &= use_h
+    gametes ^= gchromo
+    out[rep, :, lg] = gametes
+
+def next_generation(populations, mctr, rng, newpops, active=None, gmap=None, fitnesses=None):
+    # fills newpops from populations; the first mctr individuals are F1s from crop pollen, as in make_replicate();
+    # with fitnesses [replicate][individual], parents are drawn in proportion to them
+    reps, npop = populations.shape[:2]
+    if fitnesses is None:
+        parents = draw_integers(rng, 0, npop, (reps, npop, 2))
+    else:
+        parents = fitness.draw_weighted(draw_uniform(rng, (reps, npop, 2)), fitnesses)
+    make_gametes(populations, parents[:, :, 0], rng, newpops[:, :, :, 0], active, gmap)
+    newpops[:, :mctr, :, 1] = 1  # crop pollen has only crop alleles
+    make_gametes(populations, parents[:, mctr:, 1], rng, newpops[:, mctr:, :, 1], active, gmap)
+
+def monomorphic_lgs(populations, known=None):
+    # [replicate][LG] True where every homolog of the LG is the same; LGs flagged in known
+    # are taken as monomorphic without looking
+    first = populations[:, :1, :, :1]
+    candidates = (populations[:, :4] == first).all(axis=(1, 3, 4))  # cheap screen on a few individuals
+    if known is not None:
+        candidates &= ~known
+    rep, lg = np.nonzero(candidates)
+    monomorphic = np.zeros(candidates.shape, dtype=bool) if known is None else known.copy()
+    monomorphic[rep, lg] = (populations[rep, :, lg] == first[rep, :, lg]).all(axis=(1, 2, 3))
+    return monomorphic
+
+def make_replicates(params, count, rng=None):
+    if rng is None:
+        rng = RNG
+    populations = init_wildpop(params, count)
+    newpops = np.empty_like(populations)  # second buffer, filled in place each year
+    gmap = genetic_map(params)
+    fmodel = fitness_model(params)
+    fitnesses = None
+    if fmodel is not None:
+        fitnesses = fmodel.fitness_array(populations)
+    last_flow = max(params["gene_flow_list"], default=-1)
+    absorbed = np.zeros((count, params["lg_count"]), dtype=bool)
+    for year in range(params["years"]):
+        mctr = 0
+        if year in params["gene_flow_list"]:
+            mctr = int(params["npop"] * params["f1_rate"])  # obtain number of F1 progeny
+        active = None
+        if year > last_flow:
+            monomorphic = monomorphic_lgs(populations, absorbed)
+            rep, lg = np.nonzero(monomorphic & ~absorbed)
+            newpops[rep, :, lg] = populations[rep, :, lg]  # both buffers keep an absorbed LG from now on
+            absorbed = monomorphic
+            if absorbed.all():
+                break  # nothing can change any more; skipping the draws leaves every replicate as it is
+            if absorbed.mean() >= COMPACT_FRACTION:
+                active = ~absorbed
+        next_generation(populations, mctr, rng, newpops, active, gmap, fitnesses)
+        if instrument.ENABLED:
+            gametes = count * (2 * params["npop"] - mctr)
+            instrument.count("generations", count)
+            instrument.count("gametes", gametes)
+            instrument.count("recombinations", gametes * params["lg_count"])
+        populations, newpops = newpops, populations
+        if fmodel is not None:
+            fitnesses = fmodel.fitness_array(populations)  # of the new generation, for drawing its offspring's parents
+    return populations
+
+def replicate_bytes(params):
+    # working memory per replicate in a batch: both generations plus the gamete temporaries
+    return 5 * params["npop"] * params["lg_count"] * 2 * params["loci_per_lg"]
+
+def batch_size_for(params, max_bytes):
+    # replicates per batch: as many as fit in max_bytes, up to MAX_BATCH_REPLICATES
+    return max(1, min(MAX_BATCH_REPLICATES, int(max_bytes // replicate_bytes(params))))
+
+def sample_crop_counts(population, sample_size):
+    # crop allele count per [LG][locus] over the first sample_size individuals;
+    # a batch of populations gives one [LG][locus] array per replicate
+    return population[..., :sample_size, :, :, :].sum(axis=(-4, -2), dtype=np.int64)
+
+def genotype_matrix(population):
+    # crop allele count (0, 1, 2) as [LG][locus][individual]
+    return population.sum(axis=2, dtype=np.uint8).transpose(1, 2, 0)
@@ -0,0 +1,60 @@
+# fitness.py
+# October 2026.
+# Selection against crop alleles in chosen regions, for testing whether some regions are
+# less permissive to introgression than others (cropwild2.py).
+# A region is (LG, first locus, stop locus, s), numbered from 0 with stop excluded like a
+# Python slice; every crop allele copy in it multiplies the individual's fitness by
+# exp(-s), so fitness is exp(-load) with load the s-weighted crop allele count.
+# Fitness is computed once per individual, when it is built, and parents of the next
+# generation are drawn in proportion to it: the python backend builds a Walker alias table
+# (alias.py) once per generation, so each parent draw is O(1); the numpy engine draws the
+# parents of a whole batch at once from the cumulative fitness of each replicate.
+# Without regions the model is drift-only and the scripts draw parents exactly as before.
+
+import functools
+import math
+
+import numpy as np
+
+class FitnessModel:
+    def __init__(self, regions, lg_count, loci):
+        self.regions = [tuple(region) for region in regions]
+        self.weights = np.zeros((lg_count, loci))  # s per crop allele copy, [LG][locus]
+        self.masks = []  # (LG, bitmask of the region, s) for the bitmask backends
+        for lg, first, stop, s in self.regions:
+            if not (0 <= lg < lg_count and 0 <= first < stop <= loci) or s < 0:
+                raise ValueError("selection region %r is not inside %d LGs of %d loci with s >= 0"
+                                 % ((lg, first, stop, s), lg_count, loci))
+            self.weights[lg, first:stop] += s
+            self.masks.append((lg, ((1 << stop) - 1) ^ ((1 << first) - 1), s))
+        self.lgs, self.loci = np.nonzero(self.weights)  # only these loci are read
+        self.locus_weights = self.weights[self.lgs, self.loci]
+
+    def fitness_bits(self, individual):
+        # fitness of one [LG][homolog] bitmask individual of the python backend
+        load = 0.0
+        for lg, mask, s in self.masks:
+            load += s * ((individual[lg][0] & mask).bit_count() + (individual[lg][1] & mask).bit_count())
+        return math.exp(-load)
+
+    def fitness_array(self, populations):
+        # fitness [replicate][individual] of a batch [replicate][individual][LG][homolog][locus]
+        selected = populations[:, :, self.lgs, :, self.loci]  # [selected locus][replicate][individual][homolog]
+        counts = selected.sum(axis=-1, dtype=np.float64)
+        return np.exp(-np.tensordot(self.locus_weights, counts, axes=1))
+
+@functools.lru_cache(maxsize=None)
+def load_model(regions, lg_count, loci):
+    return FitnessModel(regions, lg_count, loci)
+
+def draw_weighted(uniforms, weights):
+    # index drawn with probability proportional to weights [replicate][n] for each uniform
+    # [replicate][...] on [0, 1): each replicate's normalized cumulative weights are offset
+    # by the replicate number, so one searchsorted serves the whole batch
+    reps, n = weights.shape
+    offsets = np.arange(reps).reshape((reps,) + (1,) * (uniforms.ndim - 1))
+    cumulative = np.cumsum(weights, axis=1)
+    cumulative /= cumulative[:, -1:]
+    cumulative += np.arange(reps)[:, np.newaxis]
+    index = np.searchsorted(cumulative.ravel(), (uniforms + offsets).ravel(), side="right").reshape(uniforms.shape)
+    return np.minimum(index - offsets * n, n - 1)  # rounding can put a uniform just past the last weight
@@ -0,0 +1,100 @@
+# genmap.py
+# October 2026.
+# Genetic maps for recombination: a Poisson number of crossovers per LG, placed by
+# locus-specific rates, in place of the single uniform crossover of recombine().
+# A map file has one line "lg locus cM" per SNP, LGs and loci numbered from 1 as in the
+# PLINK .bim files of genowriter.py; blank lines and lines starting with # are skipped.
+# The map distance between loci j-1 and j (in Morgans) is the rate of crossover point j,
+# so a flat stretch of the map is a cold spot.  The crossovers of a gamete are Poisson
+# with mean the LG's map length (no interference), and the gamete starts on either
+# homolog with probability 1/2 and switches at every crossover.
+# A map is read once per path (load_map is cached) and holds one alias table per LG,
+# so drawing k crossovers costs O(k) whatever the number of loci.
+
+import functools
+import hashlib
+import math
+import random
+
+import numpy as np
+
+import alias
+
+class GeneticMap:
+    def __init__(self, positions):
+        # positions [LG][locus] in cM, non-decreasing along each LG
+        positions = np.asarray(positions, dtype=np.float64)
+        rates = np.diff(positions, axis=1) / 100  # Morgans; rates[lg][r - 1] is crossover point r
+        if positions.ndim != 2 or positions.shape[1] < 2 or (rates < 0).any():
+            raise ValueError("genetic map positions must be [LG][locus] with at least 2 loci, non-decreasing")
+        self.lg_count, self.loci = positions.shape
+        self.lengths = rates.sum(axis=1)  # map length of each LG, the mean crossover count
+        self.tables = [alias.AliasTable(rate if rate.sum() > 0 else np.ones(len(rate))) for rate in rates]
+        self.prob = np.stack([table.prob for table in self.tables])  # [LG][point - 1], for drawing whole arrays
+        self.alias = np.stack([table.alias for table in self.tables])
+        self.full = (1 << self.loci) - 1
+
+    def crossover_count(self, lg, rand=random):
+        # Poisson draw by multiplying uniforms, O(count)
+        limit = math.exp(-self.lengths[lg])
+        count = 0
+        product = rand.random()
+        while product > limit:
+            count += 1
+            product *= rand.random()
+        return count
+
+    def recombine_bits(self, lg, gbits, hbits, rand=random):
+        # one gamete from the homolog bitmasks of LG lg
+        mask = self.full if rand.random() < .5 else 0  # 1 where the gamete copies homolog h
+        for k in range(self.crossover_count(lg, rand)):
+            point = self.tables[lg].sample(rand) + 1
+            mask ^= self.full ^ ((1 << point) - 1)  # switch homologs at the crossover point and above
+        return (gbits & ~mask) | (hbits & mask)
+
+    def gamete_masks(self, rng, shape):
+        # 1 where each gamete copies homolog h, as shape + [locus]; shape ends with the LG axis
+        counts = rng.poisson(self.lengths, size=shape)
+        start = rng.integers(0, 2, size=shape, dtype=np.uint8)
+        gamete = np.repeat(np.arange(counts.size), counts.ravel())  # one entry per crossover
+        lg = gamete % self.lg_count
+        column = rng.integers(0, self.loci - 1, size=len(gamete))
+        point = np.where(rng.random(len(gamete)) < self.prob[lg, column], column, self.alias[lg, column]) + 1
+        switches = np.zeros((counts.size, self.loci), dtype=np.uint8)
+        np.add.at(switches, (gamete, point), 1)
+        switches[:, 0] = start.ravel()
+        masks = np.cumsum(switches, axis=1, dtype=np.uint8)  # the parity of the switches at and below each locus
+        masks &= 1
+        return masks.reshape(shape + (self.loci,))
+
+def read_positions(path, lg_count, loci):
+    positions = np.full((lg_count, loci), np.nan)
+    with open(path) as mapfile:
+        for line in mapfile:
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            lg, locus, cm = int(fields[0]), int(fields[1]), float(fields[2])
+            if not (1 <= lg <= lg_count and 1 <= locus <= loci):
+                raise ValueError("%s: LG %d locus %d is outside %d LGs of %d loci" % (path, lg, locus, lg_count, loci))
+            positions[lg - 1, locus - 1] = cm
+    if np.isnan(positions).any():
+        raise ValueError("%s does not give a position for every locus" % path)
+    return positions
+
+def file_digest(path):
+    # sha256 of the map file's contents, so cache keys and checkpoints change when a map is edited in place
+    with open(path, "rb") as mapfile:
+        return hashlib.sha256(mapfile.read()).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def load_map(path, lg_count, loci):
+    return GeneticMap(read_positions(path, lg_count, loci))
+
+def draw_masks(gmap, rng, shape):
+    # gamete_masks() for one Generator, or a list of Generators that each own an equal,
+    # contiguous group of shape[0] (see engine.draw_integers)
+    if isinstance(rng, np.random.Generator):
+        return gmap.gamete_masks(rng, shape)
+    group_shape = (shape[0] // len(rng),) + tuple(shape[1:])
+    return np.concatenate([gmap.gamete_masks(group, group_shape) for group in rng])
@@ -0,0 +1,137 @@
+# genowriter.py
+# October 2026.
+# Streaming genotype writer for the pcadapt pipeline.
+# Rows are loci and columns are individuals, values are crop allele counts (0, 1, 2), as in
+# the pcatest files.  Rows are buffered and written CHUNK_ROWS at a time instead of building
+# the whole matrix as one string.  The optional PLINK binary output (.bed/.bim/.fam, SNP-major)
+# is read by pcadapt directly; the crop allele is A1 ("C") and the wild allele A2 ("W").
+# Chromosome codes above 22 need --allow-extra-chr in PLINK itself.
+# BackgroundWriter moves whole dumps off the simulation thread.
+
+import os
+import queue
+import threading
+
+import numpy as np
+
+CHUNK_ROWS = 256  # loci buffered before each write
+FORMATS = ("text", "plink", "both")
+BED_MAGIC = bytes([0x6C, 0x1B, 0x01])  # PLINK .bed header, SNP-major mode
+BED_CODES = np.array([0b11, 0b10, 0b00], dtype=np.uint8)  # 0, 1, 2 crop alleles -> hom A2, het, hom A1
+
+class GenotypeWriter:
+    # path is the text file; the PLINK files share its name without the extension
+    def __init__(self, path, loci_per_lg, fmt="text"):
+        if fmt not in FORMATS:
+            raise ValueError("genotype format must be one of %s, not %r" % (", ".join(FORMATS), fmt))
+        self.loci_per_lg = loci_per_lg
+        self.rows = 0
+        self.individuals = None
+        self.bytes_written = 0
+        self.buffer = []
+        self.closed = False
+        self.textfile = None
+        self.bedfile = None
+        self.bimfile = None
+        self.prefix = os.path.splitext(path)[0]
+        if fmt in ("text", "both"):
+            self.textfile = open(path, "w")
+        if fmt in ("plink", "both"):
+            self.bedfile = open(self.prefix + ".bed", "wb")
+            self.bedfile.write(BED_MAGIC)
+            self.bimfile = open(self.prefix + ".bim", "w")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def writerow(self, indgenos):  # crop allele counts of one locus, one per individual
+        if self.individuals is None:
+            self.individuals = len(indgenos)
+        self.buffer.append(indgenos)
+        if len(self.buffer) >= CHUNK_ROWS:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.textfile is not None:
+            text = "".join(" ".join(map(str, indgenos)) + "\n" for indgenos in self.buffer)
+            self.textfile.write(text)
+            self.bytes_written += len(text)
+        if self.bedfile is not None:
+            self.write_plink_rows(np.asarray(self.buffer, dtype=np.intp))
+        self.rows += len(self.buffer)
+        self.buffer = []
+
+    def write_plink_rows(self, genos):
+        # four individuals per byte, first individual in the low bits
+        padded = np.zeros((len(genos), -(-self.individuals // 4) * 4), dtype=np.uint8)
+        padded[:, :self.individuals] = BED_CODES[genos]
+        quads = padded.reshape(len(genos), -1, 4)
+        packed = quads[:, :, 0] | (quads[:, :, 1] << 2) | (quads[:, :, 2] << 4) | (quads[:, :, 3] << 6)
+        self.bedfile.write(packed.tobytes())
+        lines = []
+        for row in range(self.rows, self.rows + len(genos)):
+            lg = row // self.loci_per_lg + 1
+            locus = row % self.loci_per_lg + 1
+            lines.append("%d lg%d_%d 0 %d C W\n" % (lg, lg, locus, locus))
+        self.bimfile.write("".join(lines))
+        self.bytes_written += packed.nbytes + sum(len(line) for line in lines)
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        if self.textfile is not None:
+            self.textfile.close()
+        if self.bedfile is not None:
+            self.bedfile.close()
+            self.bimfile.close()
+            with open(self.prefix + ".fam", "w") as famfile:
+                for k in range(self.individuals or 0):
+                    famfile.write("pop ind%d 0 0 0 -9\n" % (k + 1))
+
+class BackgroundWriter:
+    # runs write(*args) on a daemon thread so the caller never waits for output.  submit()
+    # does not block: when max_pending jobs are already queued the new one is dropped and
+    # counted.  Jobs must not be modified after they are submitted.  If a write raises, the
+    # thread stops and close() re-raises the exception.
+    def __init__(self, write, max_pending=2):
+        self.write = write
+        self.dropped = 0
+        self.error = None
+        self.queue = queue.Queue(max_pending)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            try:
+                self.write(*job)
+            except BaseException as error:
+                self.error = error
+                return
+
+    def submit(self, *args):
+        try:
+            self.queue.put_nowait(args)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):  # waits for the queued jobs to finish
+        while self.thread.is_alive():  # a dead thread never takes the sentinel off a full queue
+            try:
+                self.queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
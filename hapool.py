@@ -0,0 +1,77 @@
+# hapool.py
+# October 2026.
+# Interned haplotype pool for the bitmask models in cropwild.py and simulation_for_pcadapt.py.
+# Every distinct homolog (an integer bitmask, bit j set for a crop allele at locus j) is
+# stored once and individuals hold its integer ID, so a population is one small array of
+# IDs per individual, [2 * LG + homolog], instead of a list of lists of big integers.
+# A population starts as one wild haplotype, and after the gene-flow years most homologs
+# are still one of a few distinct sequences, so most crossovers repeat: crossover() on a
+# pair of IDs at a crossover point is remembered, with the least recently used results
+# dropped beyond cache_size.  IDs are never reused; collect() drops the haplotypes no
+# individual of the current population holds, and a remembered result whose haplotype was
+# dropped is computed again.
+
+import collections
+from array import array
+
+CACHE_SIZE = 1 << 16  # crossover results remembered per pool
+
+class HaplotypePool:
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self.ids = {}  # haplotype bits -> ID
+        self.haplotypes = {}  # ID -> haplotype bits
+        self.next_id = 0
+        self.crossovers = collections.OrderedDict()  # (low ID, high ID, rpoint) -> ID, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.haplotypes)
+
+    def intern(self, bits):
+        hid = self.ids.get(bits)
+        if hid is None:
+            hid = self.next_id
+            self.next_id += 1
+            self.ids[bits] = hid
+            self.haplotypes[hid] = bits
+        return hid
+
+    def bits(self, hid):
+        return self.haplotypes[hid]
+
+    def crossover(self, low, high, rpoint):
+        # ID of the haplotype with low's alleles below locus rpoint and high's from it on
+        if low == high:
+            return low
+        key = (low, high, rpoint)
+        hid = self.crossovers.get(key)
+        if hid is not None and hid in self.haplotypes:
+            self.crossovers.move_to_end(key)
+            self.hits += 1
+            return hid
+        self.misses += 1
+        lowmask = (1 << rpoint) - 1  # loci below the crossover point
+        hid = self.intern((self.haplotypes[low] & lowmask) | (self.haplotypes[high] & ~lowmask))
+        self.crossovers[key] = hid
+        if len(self.crossovers) > self.cache_size:
+            self.crossovers.popitem(last=False)
+        return hid
+
+    def collect(self, population):
+        # drops every haplotype that no individual of population holds
+        live = set()
+        for individual in population:
+            live.update(individual)
+        for hid in [hid for hid in self.haplotypes if hid not in live]:
+            del self.ids[self.haplotypes.pop(hid)]
+
+def new_population(pool, npop, lg_count, bits=0):
+    # npop individuals whose homologs are all the haplotype bits, wild by default
+    individual = array("i", [pool.intern(bits)]) * (2 * lg_count)
+    return [array("i", individual) for k in range(npop)]
+
+def lg_bits(pool, population, lg):
+    # (g bits, h bits) of one LG for every individual
+    return [(pool.bits(individual[2 * lg]), pool.bits(individual[2 * lg + 1])) for individual in population]
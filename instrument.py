@@ -0,0 +1,154 @@
+# instrument.py
+# October 2026.
+# Opt-in instrumentation for long maxdiff.py and cropwild2.py runs: per-phase timers,
+# work counters, periodic metrics with trial rate and ETA, and a sampling profiler.
+# Everything is off until enable() is called.  Off, phase() returns one shared null context
+# and callers guard counts with "if instrument.ENABLED", so the instrumented code paths cost
+# a global lookup per phase or generation, never per gamete.
+# Phases are "simulate" (building generations), "sample" (sampled crop allele counts),
+# "stats" (trial statistics) and "output" (genotype dumps); counters are "generations",
+# "gametes", "recombinations" (gamete LGs) and "bytes_written".  Timers and counters are
+# kept per process, so with --workers above 1 they only cover the main process; the trial
+# rate and ETA always cover the whole run.
+# Metrics are one JSON object per report, printed as a "metrics {...}" line or written to a
+# file that is replaced atomically, so another process can poll it.
+# The sampling profiler records the Python stack on every SIGPROF (CPU time, Unix only) and
+# saves the counts in the folded "frame;frame;frame count" format read by flamegraph.pl
+# and speedscope.  profile_trial() reruns one trial under it; trial t always draws from the
+# same RNG stream (parallel.py), so the rerun does exactly the work of trial t.  The scripts
+# hand it their profile_run(), which skips the replicate cache and genotype dumps: a cached
+# trial would simulate nothing, and a dump would overwrite the run's own files.
+
+import collections
+import contextlib
+import json
+import os
+import signal
+import time
+
+METRICS_SECONDS = 30  # default time between metrics reports
+PROFILE_INTERVAL = 0.001  # CPU seconds between profiler samples
+
+ENABLED = False
+timers = collections.Counter()  # phase -> seconds
+counters = collections.Counter()  # counter -> total
+NULL_PHASE = contextlib.nullcontext()
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+class Phase:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        timers[self.name] += time.perf_counter() - self.start
+
+def phase(name):
+    # with instrument.phase("simulate"): ... adds the block's wall time to the phase
+    if not ENABLED:
+        return NULL_PHASE
+    return Phase(name)
+
+def count(name, amount=1):
+    if ENABLED:
+        counters[name] += amount
+
+class Progress:
+    # reports at most once every interval seconds; path None prints metrics lines instead of writing a file
+    def __init__(self, total, start=0, replicates_per_trial=1, interval=METRICS_SECONDS, path=None):
+        self.total = total
+        self.start = start
+        self.replicates_per_trial = replicates_per_trial
+        self.interval = interval
+        self.path = path
+        self.started = time.monotonic()
+        self.last_report = self.started
+
+    def metrics(self, done):
+        elapsed = time.monotonic() - self.started
+        rate = (done - self.start) / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if rate > 0:
+            eta = (self.total - done) / rate
+        return {
+            "time": time.time(),
+            "elapsed_s": elapsed,
+            "trials_done": done,
+            "trials_total": self.total,
+            "trials_per_s": rate,
+            "replicates_per_s": rate * self.replicates_per_trial,
+            "eta_s": eta,
+            "phase_s": dict(timers),
+            "counters": dict(counters),
+        }
+
+    def update(self, done):
+        if time.monotonic() - self.last_report >= self.interval:
+            self.report(done)
+
+    def report(self, done):
+        self.last_report = time.monotonic()
+        metrics = self.metrics(done)
+        if self.path is None:
+            print("metrics", json.dumps(metrics), flush=True)
+            return
+        temppath = self.path + ".tmp"
+        with open(temppath, "w") as metricsfile:
+            json.dump(metrics, metricsfile)
+        os.replace(temppath, self.path)
+
+class SamplingProfiler:
+    def __init__(self, interval=PROFILE_INTERVAL):
+        if not hasattr(signal, "setitimer"):
+            raise RuntimeError("the sampling profiler needs signal.setitimer (Unix)")
+        self.interval = interval
+        self.stacks = collections.Counter()  # folded stack -> samples
+        self.previous = None
+
+    def sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append("%s:%s" % (os.path.basename(code.co_filename), code.co_name))
+            frame = frame.f_back
+        self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.previous = signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self.previous)
+
+    def save(self, path):
+        with open(path, "w") as foldfile:
+            for stack, samples in self.stacks.most_common():
+                foldfile.write("%s %d\n" % (stack, samples))
+
+    def top(self, n=10):
+        # (function, share of samples) of the n functions most often on top of the stack
+        leaves = collections.Counter()
+        for stack, samples in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += samples
+        total = sum(leaves.values()) or 1
+        return [(name, samples / total) for name, samples in leaves.most_common(n)]
+
+def profile_trial(run_trials, master_seed, trial, path, interval=PROFILE_INTERVAL):
+    # reruns trial under the sampling profiler, saves the folded stacks to path and prints the hottest functions
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+    try:
+        run_trials(master_seed, trial, trial + 1)
+    finally:
+        profiler.stop()
+    profiler.save(path)
+    print("profile of trial", trial, "saved to", path, "samples:", sum(profiler.stacks.values()))
+    for name, share in profiler.top():
+        print("  %5.1f%%  %s" % (100 * share, name))
+    return profiler
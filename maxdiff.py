@@ -7,9 +7,22 @@
 # What is the maximum crop allele frequency observed at the end?
 
 
+import argparse
 import random
-import copy
-import sys
+
+import numpy as np
+
+import alias
+import checkpoint
+import engine
+import instrument
+import parallel
+import pedigree
+import quantiles
+import replicache
+import replistore
+import simstats
+import tracts
 
 
 # set model constants
@@ -20,128 +33,321 @@ TRIALS = 20000  # number of trials to run for calculation of confidence interval
 YEARS = 25 # number of years to simulate in model
 GENE_FLOW_LIST = [0,4]  # list of years when gene flow occurs
 F1_RATE = 0.05 # fraction of population that will be F1 in years when gene flow occurs
+GENETIC_MAP = None  # genetic map file for Poisson crossovers at map rates (genmap.py), None for one uniform crossover per LG
+SELECTION = None  # regions selected against crop alleles, [(LG, first locus, stop locus, s)] from 0 (fitness.py), None for drift only
 POPULATIONS = 7 #number of independent populations pooled for frequency analysis
 SAMPLE_SIZE = 20 # number of individuals genotyped per population
+BACKEND = "numpy"  # "numpy" for the whole-generation engine in engine.py, "pedigree" to rebuild only the sampled
+                   # individuals from the pedigree (pedigree.py), "tracts" for crop/wild tract chromosomes
+                   # (tracts.py), "python" for per-individual reproduce()
+BATCH_MEMORY_MB = 1024  # RAM the numpy backend may use for one batch of replicates
+STAT_NAMES = ("diffmax", "diff20")  # what run_trials() returns per trial, in order
+CACHE_DIR = None  # directory caching each trial's sampled crop allele counts (replicache.py), None for no cache
+CACHE_MAX_MB = 4096  # size cap of CACHE_DIR, least recently used trials are evicted first
+STORE_FILE = None  # file keeping every trial's sampled crop allele counts (replistore.py), None to keep only the statistics
+STOP_TARGETS = [("diffmax", .975), ("diff20", .975)]  # quantiles whose intervals --tolerance checks
 
 def init_wildpop():
     population = []
     for i in range(NPOP):
         individual = init_chromos()
         population.append(individual)
-    return population  # [individual][LG][homolog][locus]
+    return population  # [individual][LG][homolog], homolog is an int with bit j set if locus j is crop
 
 def init_chromos():
     individual = []
     for i in range(LG_COUNT):
-        gstring = "0" * LOCI_PER_LG  # individuals initially have no crop SNPs, only wild
-        hstring = "0" * LOCI_PER_LG
-        chromo = [gstring, hstring]
+        gbits = 0  # individuals initially have no crop SNPs, only wild
+        hbits = 0
+        chromo = [gbits, hbits]
         individual.append(chromo)
     return individual
 
-def recombine(individual): 
-    gamete = []
+def recombine(individual, child, homolog, gmap=None):  # write a recombinant gamete into one homolog of child, crossovers from gmap if given
     for i in range(LG_COUNT):
-        gstring = individual[i][0]
-        hstring = individual[i][1]
+        gbits = individual[i][0]
+        hbits = individual[i][1]
+        if gbits == hbits:  # every gamete is the same, no draws needed
+            child[i][homolog] = gbits
+            continue
+        if gmap is not None:
+            child[i][homolog] = gmap.recombine_bits(i, gbits, hbits)
+            continue
         rpoint = random.randrange(1,LOCI_PER_LG)
-        g1 = gstring[0:rpoint] + hstring[rpoint:]
-        g2 = hstring[0:rpoint] + gstring[rpoint:]
+        lowmask = (1 << rpoint) - 1  # loci below the crossover point
+        g1 = (gbits & lowmask) | (hbits & ~lowmask)
+        g2 = (hbits & lowmask) | (gbits & ~lowmask)
         x = random.random()   # randomly select one of four gametes to use in next generation
         if x < .25:
-            gamete.append(g1)
+            child[i][homolog] = g1
         elif x < .5:
-            gamete.append(g2)
+            child[i][homolog] = g2
         elif x < .75:
-            gamete.append(gstring)
+            child[i][homolog] = gbits
         else:
-            gamete.append(hstring)
-    return gamete
-
-def reproduce(population):
-    x = random.randrange(0,NPOP)
-    y = random.randrange(0, NPOP)
-    g1 = recombine(population[x])  # choose a randomly parent from the population, generate gametes, including recominant
-    g2 = recombine(population[y])
-    nextgen = []
-    for i in range(LG_COUNT):
-        chromo = [g1[i], g2[i]]
-        nextgen.append(chromo)
-    return nextgen  # returns individual 
+            child[i][homolog] = hbits
 
-def crop_pollen():
-    gamete = []
-    for i in range(LG_COUNT):
-        gstring = "1" * LOCI_PER_LG  # crop pollen has only crop alleles
-        gamete.append(gstring)
-    return gamete
-
-def geneflow(population):
-    x = random.randrange(0,NPOP)
-    g1 = recombine(population[x])  # pick individual from population to receive crop pollen adn generate gamete
-    g2 = crop_pollen()
-    nextgen = []
+def pick_parent(parents):  # uniform, or in proportion to fitness from an alias table
+    if parents is None:
+        return random.randrange(0, NPOP)
+    return parents.sample()
+
+def reproduce(population, child, parents=None, gmap=None):
+    x = pick_parent(parents)
+    y = pick_parent(parents)
+    recombine(population[x], child, 0, gmap)  # choose a randomly parent from the population, generate gametes, including recominant
+    recombine(population[y], child, 1, gmap)
+
+def crop_pollen(child):
     for i in range(LG_COUNT):
-        chromo = [g1[i], g2[i]]
-        nextgen.append(chromo)
-    return nextgen
+        child[i][1] = (1 << LOCI_PER_LG) - 1  # crop pollen has only crop alleles
+
+def geneflow(population, child, parents=None, gmap=None):
+    x = pick_parent(parents)
+    recombine(population[x], child, 0, gmap)  # pick individual from population to receive crop pollen adn generate gamete
+    crop_pollen(child)
+
+def absorbed(population):
+    # True when every homolog of every LG is the same, so later years cannot change the population
+    first = population[0]
+    return all(g == h for g, h in first) and all(individual == first for individual in population)
+
+def model_params():
+    return engine.model_params(NPOP, LG_COUNT, LOCI_PER_LG, YEARS, GENE_FLOW_LIST, F1_RATE, GENETIC_MAP, SELECTION)
+
+def make_batch(params, count, rng=None):
+    if BACKEND == "pedigree":
+        return pedigree.make_samples(params, count, SAMPLE_SIZE, rng)  # only the sampled individuals
+    return engine.make_replicates(params, count, rng)
 
 def make_replicate():
+    if BACKEND == "tracts":
+        population = tracts.make_replicate(model_params())
+        return tracts.materialize(population, tracts.snp_map(LOCI_PER_LG), SAMPLE_SIZE)
+    if BACKEND != "python":
+        return make_batch(model_params(), 1)[0]
     population = init_wildpop()
+    newpop = init_wildpop()  # second buffer, filled in place each year
+    last_flow = max(GENE_FLOW_LIST, default=-1)
+    params = model_params()
+    gmap = engine.genetic_map(params)  # None for one uniform crossover per LG
+    fmodel = engine.fitness_model(params)  # None for drift only
+    fitnesses = [1.0] * NPOP  # everyone starts wild
+    newfitnesses = [1.0] * NPOP
     for year in range(YEARS):
+        if year > last_flow and absorbed(population):
+            break
         mctr = 0
         if year in GENE_FLOW_LIST:
             mctr = int(NPOP * F1_RATE)  # obtain number of F1 progeny
-        newpop = []
+        parents = None
+        if fmodel is not None:
+            parents = alias.AliasTable(fitnesses)  # built once, each parent draw is O(1)
         for i in range(mctr):
-            nextgen = geneflow(population)
-            newpop.append(nextgen)
-        for i in range(NPOP - mctr):
-            nextgen = reproduce(population)
-            newpop.append(nextgen)
-        population = copy.deepcopy(newpop)
+            geneflow(population, newpop[i], parents, gmap)
+        for i in range(mctr, NPOP):
+            reproduce(population, newpop[i], parents, gmap)
+        if fmodel is not None:
+            for i in range(NPOP):
+                newfitnesses[i] = fmodel.fitness_bits(newpop[i])
+            fitnesses, newfitnesses = newfitnesses, fitnesses
+        if instrument.ENABLED:
+            instrument.count("generations")
+            instrument.count("gametes", 2 * NPOP - mctr)
+            instrument.count("recombinations", (2 * NPOP - mctr) * LG_COUNT)
+        population, newpop = newpop, population  # swap buffers, last year's population is overwritten next year
     return population
 
+def iter_simlists(master_seed, start, stop):
+    # yields the POPULATIONS replicates of trials start..stop-1, each trial from its own
+    # RNG stream; the array backends simulate as many whole trials per batch as fit in BATCH_MEMORY_MB
+    # and engine.MAX_BATCH_REPLICATES, and at least one
+    if BACKEND in ("numpy", "pedigree"):
+        params = model_params()
+        batch_trials = max(1, engine.batch_size_for(params, BATCH_MEMORY_MB * 2**20) // POPULATIONS)
+        for first in range(start, stop, batch_trials):
+            rngs = []
+            for trial in range(first, min(first + batch_trials, stop)):
+                rngs.append(parallel.trial_rng(master_seed, trial))
+            with instrument.phase("simulate"):
+                batch = make_batch(params, len(rngs) * POPULATIONS, rngs)
+            for simlist in batch.reshape((-1, POPULATIONS) + batch.shape[1:]):
+                yield simlist
+        return
+    for trial in range(start, stop):
+        random.seed(parallel.trial_seed(master_seed, trial))
+        simlist = []
+        with instrument.phase("simulate"):
+            for rep in range(POPULATIONS): 
+                population = make_replicate()
+                #output_genotypes(population)
+                simlist.append(population)
+        yield simlist
 
-def calc_lg_freqs(lgfreqlist, simlist):
-    for i in range(LG_COUNT):
-        for j in range(LOCI_PER_LG):
-            croptot = 0
-            for population in simlist:
-                for k in range(SAMPLE_SIZE):
-                    cropct = int(population[k][i][0][j]) + int(population[k][i][1][j])
-                    croptot = croptot + cropct
-            cropfreq = croptot / (SAMPLE_SIZE * POPULATIONS * 2)
-            #print("LG, cropfreq: ", i, cropfreq)
-            lgfreqlist.append(cropfreq)
-    return lgfreqlist
+def sample_counts(simlist):
+    # crop allele counts of the sampled individuals as [population][LG][locus]
+    with instrument.phase("sample"):
+        if BACKEND != "python":
+            return engine.sample_crop_counts(np.asarray(simlist), SAMPLE_SIZE)
+        # every sampled homolog's bitmask as little-endian bytes, unpacked to one bit per locus in one call
+        nbytes = (LOCI_PER_LG + 7) // 8
+        data = b"".join(hbits.to_bytes(nbytes, "little") for population in simlist
+                        for individual in population[:SAMPLE_SIZE] for chromo in individual for hbits in chromo)
+        homologs = np.frombuffer(data, dtype=np.uint8).reshape(POPULATIONS, SAMPLE_SIZE, LG_COUNT, 2, nbytes)
+        bits = np.unpackbits(homologs, axis=-1, bitorder="little")[..., :LOCI_PER_LG]
+        return bits.sum(axis=(1, 3), dtype=np.int64)
+
+def run_fields():  # everything besides the seed that determines a trial's counts
+    params = model_params()
+    fields = dict(params, backend=BACKEND, sample_size=SAMPLE_SIZE, populations=POPULATIONS)
+    if GENETIC_MAP is not None:  # the map file's contents, not just its path
+        fields["genetic_map_sha256"] = engine.genetic_map_digest(params)
+    return fields
 
+def iter_trial_counts(master_seed, start, stop):
+    # yields sample_counts() of trials start..stop-1, simulating only the trials missing from CACHE_DIR
+    if CACHE_DIR is None:
+        for simlist in iter_simlists(master_seed, start, stop):
+            yield sample_counts(simlist)
+        return
+    cache = replicache.open_cache(CACHE_DIR, CACHE_MAX_MB * 2**20)
+    fields = dict(run_fields(), script="maxdiff", master_seed=master_seed)
+    def simulate(first, stop):
+        for simlist in iter_simlists(master_seed, first, stop):
+            yield sample_counts(simlist)
+    yield from replicache.iter_cached(cache, fields, start, stop, simulate)
+
+def lg_freqs(counts):
+    # sampled crop allele frequency of every locus, pooled across populations, as [trial][LG * locus]
+    croptots = counts.sum(axis=1, dtype=np.int64)
+    return croptots.reshape(len(counts), -1) / (SAMPLE_SIZE * POPULATIONS * 2)
+
+def trial_stats(counts):
+    # (highest, 20th highest) locus frequency of each trial in counts [trial][population][LG][locus]
+    with instrument.phase("stats"):
+        ranks = simstats.order_statistics(lg_freqs(counts), [-1, -20])
+        return [tuple(stats) for stats in ranks.tolist()]
+
+def trial_cost():  # relative work per trial, used by sweep.py to run cheap points first
+    return NPOP * LG_COUNT * LOCI_PER_LG * YEARS * POPULATIONS
+
+def upper_rank(trials):  # rank of the reported upper 95% bound among the sorted trial statistics
+    return int(.975 * trials)
+
+def profile_run(master_seed, start, stop):
+    # run_trials() without CACHE_DIR, so --profile-trial always simulates its trial
+    return trial_stats(np.array([sample_counts(simlist) for simlist in iter_simlists(master_seed, start, stop)]))
+
+def run_trials(master_seed, start, stop):  # work unit for parallel.run_trials()
+    return trial_stats(np.array(list(iter_trial_counts(master_seed, start, stop))))
+
+def run_counts(master_seed, start, stop):  # work unit returning the counts themselves, for STORE_FILE
+    return list(iter_trial_counts(master_seed, start, stop))
+
+def open_store(master_seed, start):
+    # STORE_FILE for trials start.. onward, keeping the trials before start when resuming
+    if start > 0:
+        store = replistore.ReplicateStore(STORE_FILE)
+        if len(store) < start:
+            raise ValueError("%s holds %d trials but the checkpoint counts %d" % (STORE_FILE, len(store), start))
+        store.truncate(start)
+        return store
+    attrs = dict(run_fields(), master_seed=master_seed)
+    shape = (POPULATIONS, LG_COUNT, LOCI_PER_LG)
+    return replistore.ReplicateStore.create(STORE_FILE, shape, np.min_scalar_type(2 * SAMPLE_SIZE), attrs)
+
+def iter_results(master_seed, workers, start=0, store=None):
+    # trial_stats() of trials start..TRIALS-1 in order, appending each trial's counts to store if there is one
+    if store is None:
+        yield from parallel.run_trials(run_trials, TRIALS, master_seed, workers, start)
+        return
+    for counts in parallel.run_trials(run_counts, TRIALS, master_seed, workers, start):
+        store.append(counts)
+        yield trial_stats(counts[np.newaxis])[0]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Null distribution of the maximum sampled crop allele frequency.")
+    parser.add_argument("rep", help="label for this run, used in the output file name")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default 1)")
+    parser.add_argument("--seed", type=int, default=None, help="master seed (default: drawn from system entropy)")
+    parser.add_argument("--checkpoint", default=None, help="file to checkpoint the finished trials to (default: no checkpoints)")
+    parser.add_argument("--checkpoint-every", type=float, default=checkpoint.CHECKPOINT_SECONDS,
+                        help="seconds between checkpoints (default %(default)s)")
+    parser.add_argument("--resume", action="store_true", help="continue from the --checkpoint file")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="stop once the 95%% interval of every STOP_TARGETS quantile is at most this wide; TRIALS is then the maximum")
+    parser.add_argument("--metrics-every", type=float, default=None,
+                        help="report trial rate, ETA, phase times and counters every this many seconds (default: off)")
+    parser.add_argument("--metrics-file", default=None, help="write the metrics reports to this JSON file instead of printing them")
+    parser.add_argument("--profile-trial", type=int, default=None,
+                        help="rerun this trial (0 to TRIALS-1) under the sampling profiler first, bypassing CACHE_DIR")
+    parser.add_argument("--profile-out", default=None, help="folded stacks of --profile-trial (default profile_<trial>.folded)")
+    args = parser.parse_args()
+    if args.profile_trial is not None and not 0 <= args.profile_trial < TRIALS:
+        parser.error("--profile-trial must be from 0 to TRIALS-1 = %d" % (TRIALS - 1))
+    if args.resume and args.checkpoint is None:
+        parser.error("--resume needs --checkpoint")
+    return args
 
 def main():
-    args = sys.argv
-    rep = str(args[1])
-    diffmaxlist = []
-    diff20list = []
-    outstr = "LGintrog_" + rep + ".txt"
-    outfile = open(outstr, "w")
-    for trial in range(TRIALS):
+    args = parse_args()
+    rep = args.rep
+    start = 0
+    if args.resume:
+        master_seed, start, accumulators = checkpoint.load_checkpoint(args.checkpoint, "maxdiff", TRIALS, run_fields())
+        print("resuming at trial", start)
+        diffmaxes = accumulators["diffmax"]
+        diff20s = accumulators["diff20"]
+    else:
+        master_seed = args.seed
+        if master_seed is None:
+            master_seed = parallel.new_master_seed()
+        diffmaxes = quantiles.QuantileAccumulator()
+        diff20s = quantiles.QuantileAccumulator()
+    print("master seed:", master_seed)
+    accumulators = {"diffmax": diffmaxes, "diff20": diff20s}
+    store = None
+    if STORE_FILE is not None:
+        store = open_store(master_seed, start)
+    checkpointer = checkpoint.Checkpointer(args.checkpoint, "maxdiff", master_seed, TRIALS, args.checkpoint_every,
+                                           run_fields(), store.sync if store is not None else None)
+    if args.profile_trial is not None:
+        profile_out = args.profile_out or "profile_%d.folded" % args.profile_trial
+        instrument.profile_trial(profile_run, master_seed, args.profile_trial, profile_out)
+    progress = None
+    if args.metrics_every is not None or args.metrics_file is not None:
+        instrument.enable()
+        progress = instrument.Progress(TRIALS, start, POPULATIONS, args.metrics_every or instrument.METRICS_SECONDS,
+                                       args.metrics_file)
+    shardpath = "LGintrog_" + rep + ".json"  # merge the shards of several runs with quantiles.py
+    results = iter_results(master_seed, args.workers, start, store)
+    for trial, (diffmax, diff20) in enumerate(results, start):
         if trial % 10 == 0:
                 print("replicate: ", trial)
-        lgfreqlist = []
-        simlist = []
-        for rep in range(POPULATIONS): 
-            population = make_replicate()
-            #output_genotypes(population)
-            simlist.append(population)
-        lgfreqlist = calc_lg_freqs(lgfreqlist, simlist)
-        lgfreqlist.sort()
-        diffmaxlist.append(lgfreqlist[1699])
-        diff20list.append(lgfreqlist[1680])
-
-    diffmaxlist.sort()
-    diff20list.sort()
-    print("Upper 95% CI for difference:", diffmaxlist[int(.975*TRIALS)])
-    print("upper 95% CI for 20th rank difference", diff20list[int(.975*TRIALS)])
-    print("Max difference observed; ", diffmaxlist[TRIALS-1])
-
-main()
\ No newline at end of file
+        diffmaxes.add(diffmax)
+        diff20s.add(diff20)
+        checkpointer.maybe_save(trial + 1, accumulators)
+        if progress is not None:
+            progress.update(trial + 1)
+        if args.tolerance is not None and (trial + 1) % parallel.CHUNK_TRIALS == 0:
+            if quantiles.converged(accumulators, STOP_TARGETS, args.tolerance):
+                break
+    results.close()  # cancels the chunks not started yet after an early stop
+    trials = diffmaxes.count
+    if progress is not None:
+        progress.report(trials)
+    checkpointer.save(trials, accumulators)
+    if store is not None:
+        store.close()
+    if args.tolerance is not None:
+        print("trials used:", trials)
+        for name, q in STOP_TARGETS:
+            print(name, q, "quantile 95% interval width:", quantiles.interval_width(accumulators[name], q))
+
+    quantiles.save_shard(shardpath, accumulators)
+    print("Upper 95% CI for difference:", diffmaxes.order_statistic(upper_rank(trials)))
+    print("upper 95% CI for 20th rank difference", diff20s.order_statistic(upper_rank(trials)))
+    print("Max difference observed; ", diffmaxes.order_statistic(trials-1))
+
+if __name__ == "__main__":
+    main()
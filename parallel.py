@@ -0,0 +1,43 @@
+# parallel.py
+# October 2026.
+# Deterministic process-pool driver for the Monte Carlo trials in maxdiff.py and cropwild2.py.
+# Every trial draws from its own RNG stream, derived from one master seed and the trial
+# index, so the results are bit-identical no matter how many workers run them.
+
+import concurrent.futures
+
+import numpy as np
+
+CHUNK_TRIALS = 20  # trials handed to a worker at a time
+
+def new_master_seed():
+    return int(np.random.SeedSequence().entropy)  # fresh seed from system entropy, print it to rerun
+
+def trial_seedseq(master_seed, trial):
+    return np.random.SeedSequence(master_seed, spawn_key=(trial,))
+
+def trial_rng(master_seed, trial):
+    return np.random.default_rng(trial_seedseq(master_seed, trial))
+
+def trial_seed(master_seed, trial):
+    # integer seed for random.seed() in the pure Python backends
+    return int.from_bytes(trial_seedseq(master_seed, trial).generate_state(4).tobytes(), "little")
+
+def run_trials(run_chunk, trials, master_seed, workers=1, start=0):
+    # run_chunk(master_seed, first, stop) returns one result per trial in first..stop-1;
+    # yields the results of trials start..trials-1 in trial order
+    chunks = []
+    for first in range(start, trials, CHUNK_TRIALS):
+        chunks.append((first, min(first + CHUNK_TRIALS, trials)))
+    if workers == 1:
+        for first, stop in chunks:
+            yield from run_chunk(master_seed, first, stop)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_chunk, master_seed, first, stop) for first, stop in chunks]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:  # a caller that stops early (adaptive stopping) does not wait for the remaining chunks
+            for future in futures:
+                future.cancel()
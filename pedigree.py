@@ -0,0 +1,101 @@
+# pedigree.py
+# October 2026.
+# Pedigree-first backend: record the pedigree cheaply, then rebuild only the sampled individuals.
+# The forward pass draws, for every year, each individual's parents and, per homolog and LG,
+# the crossover point and the homologs used on either side of it, with the same distribution
+# as engine.make_gametes().  No genomes are built in the forward pass.
+# The backward pass follows the ancestry segments of the sampled homologs up the pedigree.
+# A segment that reaches crop pollen is crop, one that reaches the founders is wild, so
+# lineages that never reach the sample are never touched and the cost does not grow with NPOP.
+
+import numpy as np
+
+import engine
+
+def record_pedigree(params, count, rng=None):
+    # one entry per year: parents [replicate][individual][homolog] (-1 = crop pollen),
+    # rpoint and choice [replicate][individual][homolog][LG]
+    if rng is None:
+        rng = engine.RNG
+    if params.get("genetic_map") is not None:
+        raise ValueError("the pedigree backend models one crossover per LG; use the numpy backend with a genetic map")
+    if params.get("selection") is not None:
+        raise ValueError("the pedigree backend is drift-only; use the numpy backend with selection")
+    npop = params["npop"]
+    lg_count = params["lg_count"]
+    loci = params["loci_per_lg"]
+    years = []
+    for year in range(params["years"]):
+        mctr = 0
+        if year in params["gene_flow_list"]:
+            mctr = int(npop * params["f1_rate"])  # obtain number of F1 progeny
+        parents = engine.draw_integers(rng, 0, npop, (count, npop, 2), np.int32)
+        parents[:, :mctr, 1] = -1  # the first mctr individuals are F1s from crop pollen
+        rpoint = engine.draw_integers(rng, 1, loci, (count, npop, 2, lg_count), np.int32)
+        choice = engine.draw_integers(rng, 0, 4, (count, npop, 2, lg_count), np.uint8)
+        years.append((parents, rpoint, choice))
+    return years
+
+def trace_crop_segments(params, pedigree, count, sample_size):
+    # returns target, start, end of every crop segment in the sample; target numbers the
+    # sampled homologs as [replicate][individual][LG][homolog] flattened
+    npop = params["npop"]
+    lg_count = params["lg_count"]
+    loci = params["loci_per_lg"]
+    rep, ind, lg, hom = np.indices((count, sample_size, lg_count, 2)).reshape(4, -1)
+    target = np.arange(len(rep))
+    start = np.zeros(len(rep), dtype=np.int32)
+    end = np.full(len(rep), loci, dtype=np.int32)
+    crop_target = []
+    crop_start = []
+    crop_end = []
+    first_flow = min(params["gene_flow_list"], default=params["years"])
+    for year in range(params["years"] - 1, first_flow - 1, -1):  # before the first F1s everything is wild
+        parents, rpoint, choice = pedigree[year]
+        chromo = (rep * npop + ind) * 2 + hom  # flat index of the homolog each segment sits on
+        parent = parents.ravel()[chromo]
+        crop = parent < 0
+        crop_target.append(target[crop])
+        crop_start.append(start[crop])
+        crop_end.append(end[crop])
+        keep = ~crop
+        rep, lg, start, end, target = rep[keep], lg[keep], start[keep], end[keep], target[keep]
+        ind = parent[keep]
+        chromo = chromo[keep] * lg_count + lg
+        r = rpoint.ravel()[chromo]
+        c = choice.ravel()[chromo]
+        first = c & 1  # homolog used below the crossover point
+        second = c >> 1  # homolog used from the crossover point on
+        # a segment entirely on one side of the crossover point, or one whose two sides
+        # come from the same homolog, moves up as a whole
+        split = (start < r) & (end > r) & (first != second)
+        whole = np.where((end <= r) | (first == second), first, second)
+        rep = np.concatenate([rep, rep[split]])
+        ind = np.concatenate([ind, ind[split]])
+        lg = np.concatenate([lg, lg[split]])
+        target = np.concatenate([target, target[split]])
+        hom = np.concatenate([np.where(split, first, whole), second[split]])
+        start, end = (
+            np.concatenate([start, r[split]]),
+            np.concatenate([np.where(split, r, end), end[split]]),
+        )
+        if len(target) == 0:
+            break
+    if not crop_target:  # no gene flow within the simulated years, so no crop ancestry
+        return np.zeros(0, dtype=target.dtype), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    return np.concatenate(crop_target), np.concatenate(crop_start), np.concatenate(crop_end)
+
+def make_samples(params, count, sample_size, rng=None):
+    # sampled individuals of count replicates as [replicate][individual][LG][homolog][locus],
+    # distributed as the first sample_size individuals of engine.make_replicates()
+    pedigree = record_pedigree(params, count, rng)
+    target, start, end = trace_crop_segments(params, pedigree, count, sample_size)
+    loci = params["loci_per_lg"]
+    homologs = count * sample_size * params["lg_count"] * 2
+    # crop segments of one homolog never overlap, so a running sum of +1 at each start
+    # and -1 at each end marks exactly the crop loci
+    edges = np.zeros((homologs, loci + 1), dtype=np.int8)
+    np.add.at(edges, (target, start), 1)
+    np.add.at(edges, (target, end), -1)
+    samples = np.cumsum(edges[:, :loci], axis=1, dtype=np.int8).astype(np.uint8)
+    return samples.reshape(count, sample_size, params["lg_count"], 2, loci)
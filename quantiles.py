@@ -0,0 +1,263 @@
+# quantiles.py
+# October 2026.
+# Streaming quantiles of trial statistics, mergeable across runs.
+# A QuantileAccumulator counts every distinct value exactly; the sampled allele
+# frequencies of maxdiff.py are multiples of 1 / (2 * SAMPLE_SIZE * POPULATIONS), so they
+# take few distinct values and their quantiles stay exact for any number of trials.
+# Once a statistic has more than max_exact distinct values the counts move into a
+# QuantileSketch, a DDSketch-style histogram with logarithmic buckets, whose quantiles are
+# within a relative error alpha of the true value and whose memory is bounded by max_buckets.
+# Accumulators are saved as JSON shards, {statistic name: accumulator}, and shards from
+# separate runs, processes or nodes merge into the same result as one run over all trials.
+# quantile_interval() and converged() support sequential stopping: a run can stop once
+# the distribution-free confidence interval of every quantile it reports is narrow enough.
+# Run as a script to merge shards:  python quantiles.py shard1.json shard2.json ... --out all.json
+# (--script maxdiff or cropwild2 reports the 97.5% bound at that script's rank).
+
+import argparse
+import collections
+import importlib
+import json
+import math
+
+MAX_EXACT_VALUES = 100000  # distinct values counted exactly before switching to the sketch
+SKETCH_ALPHA = 0.001  # relative accuracy of sketch quantiles
+SKETCH_MAX_BUCKETS = 4096  # the lowest buckets are merged beyond this
+STOP_MIN_TRIALS = 200  # converged() never stops before this many trials
+STOP_Z = 1.96  # normal quantile of the stopping intervals, 95% confidence
+
+class QuantileSketch:
+    def __init__(self, alpha=SKETCH_ALPHA, max_buckets=SKETCH_MAX_BUCKETS):
+        self.alpha = alpha
+        self.max_buckets = max_buckets
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = collections.Counter()  # bucket i holds values in (gamma**(i-1), gamma**i]
+        self.negative = collections.Counter()  # the same for -value
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def bucket(self, magnitude):
+        return math.ceil(math.log(magnitude) / self.log_gamma)
+
+    def add(self, value, weight=1):
+        if value > 0:
+            self.positive[self.bucket(value)] += weight
+        elif value < 0:
+            self.negative[self.bucket(-value)] += weight
+        else:
+            self.zeros += weight
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.positive) + len(self.negative) > self.max_buckets:
+            self.collapse()
+
+    def collapse(self):
+        # merges the lowest buckets (smallest magnitudes) into their neighbours,
+        # so only the accuracy of values nearest zero suffers
+        while len(self.positive) + len(self.negative) > self.max_buckets:
+            store = self.positive if len(self.positive) > 1 else self.negative
+            lowest, second = sorted(store)[:2]
+            store[second] += store.pop(lowest)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different alpha")
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.collapse()
+
+    def order_statistic(self, rank):
+        # approximately the value at position rank (from 0) of the sorted values
+        if not 0 <= rank < self.count:
+            raise IndexError("rank out of range")
+        if rank == 0:
+            return self.min
+        if rank == self.count - 1:
+            return self.max
+        seen = 0
+        for i in sorted(self.negative, reverse=True):
+            seen += self.negative[i]
+            if seen > rank:
+                return max(self.min, -2 * self.gamma**i / (self.gamma + 1))
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for i in sorted(self.positive):
+            seen += self.positive[i]
+            if seen > rank:
+                return min(self.max, 2 * self.gamma**i / (self.gamma + 1))
+
+    def to_dict(self):
+        return {
+            "alpha": self.alpha,
+            "max_buckets": self.max_buckets,
+            "positive": sorted(self.positive.items()),
+            "negative": sorted(self.negative.items()),
+            "zeros": self.zeros,
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["alpha"], data["max_buckets"])
+        sketch.positive.update(dict(data["positive"]))
+        sketch.negative.update(dict(data["negative"]))
+        sketch.zeros = data["zeros"]
+        sketch.count = data["count"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        return sketch
+
+class QuantileAccumulator:
+    def __init__(self, max_exact=MAX_EXACT_VALUES, alpha=SKETCH_ALPHA):
+        self.max_exact = max_exact
+        self.alpha = alpha
+        self.exact = collections.Counter()  # value -> count, until there are too many values
+        self.sketch = None
+
+    @property
+    def count(self):
+        if self.sketch is not None:
+            return self.sketch.count
+        return sum(self.exact.values())
+
+    def add(self, value, weight=1):
+        value = float(value)
+        if self.sketch is not None:
+            self.sketch.add(value, weight)
+            return
+        self.exact[value] += weight
+        if len(self.exact) > self.max_exact:
+            self.to_sketch()
+
+    def to_sketch(self):
+        self.sketch = QuantileSketch(self.alpha)
+        for value, weight in self.exact.items():
+            self.sketch.add(value, weight)
+        self.exact = collections.Counter()
+
+    def merge(self, other):
+        if other.sketch is not None and self.sketch is None:
+            self.to_sketch()
+        if self.sketch is not None:
+            if other.sketch is not None:
+                self.sketch.merge(other.sketch)
+            else:
+                for value, weight in other.exact.items():
+                    self.sketch.add(value, weight)
+            return
+        self.exact.update(other.exact)
+        if len(self.exact) > self.max_exact:
+            self.to_sketch()
+
+    def order_statistic(self, rank):
+        # the value at position rank (from 0) of the sorted values, e.g. flist[rank] after flist.sort()
+        if self.sketch is not None:
+            return self.sketch.order_statistic(rank)
+        if not 0 <= rank < self.count:
+            raise IndexError("rank out of range")
+        seen = 0
+        for value in sorted(self.exact):
+            seen += self.exact[value]
+            if seen > rank:
+                return value
+
+    def quantile(self, q):
+        return self.order_statistic(min(int(q * self.count), self.count - 1))
+
+    def to_dict(self):
+        data = {"max_exact": self.max_exact, "alpha": self.alpha}
+        if self.sketch is not None:
+            data["sketch"] = self.sketch.to_dict()
+        else:
+            data["exact"] = sorted(self.exact.items())
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        accumulator = cls(data["max_exact"], data["alpha"])
+        if "sketch" in data:
+            accumulator.sketch = QuantileSketch.from_dict(data["sketch"])
+        else:
+            accumulator.exact.update(dict(data["exact"]))
+        return accumulator
+
+def quantile_interval(accumulator, q, z=STOP_Z):
+    # confidence interval for the q quantile from the order statistics alone: the rank of
+    # the quantile among n trials is Binomial(n, q), approximated as normal
+    n = accumulator.count
+    half = z * math.sqrt(n * q * (1 - q))
+    lower = max(0, math.floor(n * q - half))
+    upper = min(n - 1, math.ceil(n * q + half))
+    return accumulator.order_statistic(lower), accumulator.order_statistic(upper)
+
+def interval_width(accumulator, q):
+    lower, upper = quantile_interval(accumulator, q)
+    return upper - lower
+
+def converged(accumulators, targets, tolerance, min_trials=STOP_MIN_TRIALS):
+    # True when the interval of every (name, q) quantile in targets is at most tolerance wide
+    for name, q in targets:
+        if accumulators[name].count < min_trials or interval_width(accumulators[name], q) > tolerance:
+            return False
+    return True
+
+def save_shard(path, accumulators):
+    with open(path, "w") as shardfile:
+        json.dump({name: accumulator.to_dict() for name, accumulator in accumulators.items()}, shardfile)
+
+def load_shard(path):
+    with open(path) as shardfile:
+        return {name: QuantileAccumulator.from_dict(data) for name, data in json.load(shardfile).items()}
+
+def merge_shards(paths):
+    merged = {}
+    for path in paths:
+        for name, accumulator in load_shard(path).items():
+            if name in merged:
+                merged[name].merge(accumulator)
+            else:
+                merged[name] = accumulator
+    return merged
+
+def upper_rank(count):  # rank of the 97.5% bound among count sorted values, as quantile(.975)
+    return min(int(.975 * count), count - 1)
+
+def report(accumulators, upper_rank=upper_rank):
+    # prints the trials, 2.5% and 97.5% bounds and maximum of each statistic; scripts pass
+    # their own upper_rank() so a merged run reports the same bound as one process
+    for name, accumulator in accumulators.items():
+        print(name, "trials:", accumulator.count, "2.5%:", accumulator.quantile(.025),
+              "97.5%:", accumulator.order_statistic(upper_rank(accumulator.count)),
+              "max:", accumulator.order_statistic(accumulator.count - 1))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Merge quantile shards and print their 95% intervals.")
+    parser.add_argument("shards", nargs="+", help="JSON shards written by maxdiff.py or cropwild2.py --shard")
+    parser.add_argument("--out", default=None, help="also save the merged shard here")
+    parser.add_argument("--script", choices=["maxdiff", "cropwild2"], default=None,
+                        help="script that wrote the shards, to report its 97.5%% bound rank (default int(.975*trials))")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    merged = merge_shards(args.shards)
+    if args.script is not None:
+        report(merged, importlib.import_module(args.script).upper_rank)
+    else:
+        report(merged)
+    if args.out is not None:
+        save_shard(args.out, merged)
+
+if __name__ == "__main__":
+    main()
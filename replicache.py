@@ -0,0 +1,129 @@
+# replicache.py
+# October 2026.
+# On-disk cache of the sampled crop allele counts of simulated trials.
+# An entry is the [replicate][LG][locus] crop allele counts of one trial's sampled
+# individuals, stored as a .npy file in the smallest unsigned type that holds them.
+# Entries are keyed by a hash of everything that determines them: the model parameters
+# (with the contents of a genetic map file, not only its path), backend, sample size, replicates per trial, master seed and trial index.  Statistics
+# computed from the counts can then be changed and rerun without simulating again.
+# The cache is capped at max_bytes; reading an entry refreshes its mtime and the oldest
+# entries are deleted first (LRU).  Writes go through a temporary file and os.replace(),
+# so worker processes sharing a directory never see half-written entries.
+# Each process opens a directory once (open_cache()) and keeps the cache for all its chunks;
+# the directory is only scanned for its size on the first put(), not when it is opened, so
+# a rerun that finds every trial cached never scans it at all.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+CACHE_VERSION = 1  # bump when a model change makes old entries wrong
+
+def cache_key(fields):
+    # fields is a JSON-serializable dict
+    text = json.dumps(dict(fields, cache_version=CACHE_VERSION), sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+CACHES = {}  # (directory, max_bytes) -> the ReplicateCache of this process
+
+def open_cache(directory, max_bytes):
+    # the process's cache for directory, created on first use
+    key = (directory, max_bytes)
+    if key not in CACHES:
+        CACHES[key] = ReplicateCache(directory, max_bytes)
+    return CACHES[key]
+
+class ReplicateCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = None  # bytes of all entries, scanned by the first put()
+
+    def entries(self):
+        for subdir in os.scandir(self.directory):
+            if subdir.is_dir():
+                for entry in os.scandir(subdir.path):
+                    if entry.name.endswith(".npy"):
+                        yield entry.path
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".npy")
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            counts = np.load(path)
+            os.utime(path)  # most recently used
+        except (FileNotFoundError, ValueError):  # missing, or evicted by another process while reading
+            self.misses += 1
+            return None
+        self.hits += 1
+        return counts
+
+    def put(self, key, counts):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        counts = np.asarray(counts)
+        counts = counts.astype(np.min_scalar_type(int(counts.max(initial=0))))
+        temppath = path + ".%d.tmp" % os.getpid()
+        with open(temppath, "wb") as tempfile:
+            np.save(tempfile, counts)
+        if self.total_bytes is None:
+            os.replace(temppath, path)
+            self.total_bytes = sum(os.path.getsize(entry) for entry in self.entries())
+        else:
+            try:
+                self.total_bytes -= os.path.getsize(path)  # an overwritten entry no longer counts
+            except FileNotFoundError:
+                pass
+            os.replace(temppath, path)
+            self.total_bytes += os.path.getsize(path)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        # deletes least recently used entries until the cache is at 90% of max_bytes
+        entries = []
+        for path in self.entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        self.total_bytes = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if self.total_bytes <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+
+def iter_cached(cache, fields, start, stop, simulate):
+    # yields the counts of trials start..stop-1, keyed by fields plus the trial index.
+    # simulate(first, stop) yields the counts of trials first..stop-1; it is called once
+    # for each run of trials missing from the cache, and its results are stored.
+    trial = start
+    while trial < stop:
+        counts = cache.get(cache_key(dict(fields, trial=trial)))
+        if counts is not None:
+            yield counts
+            trial += 1
+            continue
+        missing = trial + 1
+        while missing < stop and cache_key(dict(fields, trial=missing)) not in cache:
+            missing += 1
+        for counts in simulate(trial, missing):
+            cache.put(cache_key(dict(fields, trial=trial)), counts)
+            yield counts
+            trial += 1
@@ -0,0 +1,151 @@
+# replistore.py
+# October 2026.
+# Append-only store of every trial's sampled crop allele counts, read back memory-mapped.
+# The data file is the raw C-order array [trial][population][LG][locus] in one small
+# unsigned type; a JSON file next to it (path + ".json") holds the per-trial shape, dtype
+# and any attributes (model parameters, master seed).  The number of trials is the data
+# file size divided by the trial size, so a store cut short by a crash stays readable
+# up to its last whole trial.
+# The statistics below run over chunks of CHUNK_TRIALS trials, so the memory they use
+# does not grow with the number of trials; the operating system pages the rest.
+
+import json
+import os
+
+import numpy as np
+
+import simstats
+
+CHUNK_TRIALS = 4096  # trials read at a time by the statistics
+
+class ReplicateStore:
+    def __init__(self, path):
+        self.path = path
+        with open(path + ".json") as metafile:
+            meta = json.load(metafile)
+        self.trial_shape = tuple(meta["trial_shape"])
+        self.dtype = np.dtype(meta["dtype"])
+        self.attrs = meta["attrs"]
+        self.trial_bytes = int(np.prod(self.trial_shape)) * self.dtype.itemsize
+        self.datafile = None
+
+    @classmethod
+    def create(cls, path, trial_shape, dtype, attrs=None):
+        # a new empty store, overwriting any store at path
+        meta = {"trial_shape": list(trial_shape), "dtype": np.dtype(dtype).str, "attrs": attrs or {}}
+        with open(path + ".json", "w") as metafile:
+            json.dump(meta, metafile)
+        open(path, "wb").close()
+        return cls(path)
+
+    def __len__(self):
+        return os.path.getsize(self.path) // self.trial_bytes
+
+    def append(self, counts):  # one trial's counts
+        counts = np.asarray(counts)
+        if counts.shape != self.trial_shape:
+            raise ValueError("trial counts have shape %s, the store holds %s" % (counts.shape, self.trial_shape))
+        if counts.max(initial=0) > np.iinfo(self.dtype).max:
+            raise ValueError("crop allele count too large for " + self.dtype.name)
+        if self.datafile is None:
+            self.datafile = open(self.path, "ab")
+        self.datafile.write(counts.astype(self.dtype).tobytes())
+
+    def truncate(self, trials):
+        # drops every trial from trials on, e.g. those written after a resumed run's checkpoint
+        if trials > len(self):
+            raise ValueError("%s holds %d trials, cannot keep %d" % (self.path, len(self), trials))
+        self.close()
+        os.truncate(self.path, trials * self.trial_bytes)
+
+    def sync(self):
+        # flushes the appended trials and forces them to disk
+        if self.datafile is not None:
+            self.datafile.flush()
+            os.fsync(self.datafile.fileno())
+
+    def close(self):
+        if self.datafile is not None:
+            self.datafile.close()
+            self.datafile = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def array(self):
+        # the whole store as a read-only [trial][population][LG][locus] memmap, no data is read yet
+        if self.datafile is not None:
+            self.datafile.flush()
+        trials = len(self)
+        if trials == 0:
+            return np.zeros((0,) + self.trial_shape, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=(trials,) + self.trial_shape)
+
+    def chunks(self, chunk_trials=CHUNK_TRIALS):
+        # yields (first trial, [trial][population][LG][locus] view) chunk by chunk
+        data = self.array()
+        for first in range(0, len(data), chunk_trials):
+            yield first, data[first:first + chunk_trials]
+
+def pooled_counts(chunk):
+    # crop allele counts pooled over populations, [trial][LG][locus]
+    return chunk.sum(axis=1, dtype=np.int64)
+
+def order_statistics(store, ranks, chunk_trials=CHUNK_TRIALS):
+    # per trial, the pooled locus counts at the given positions of the ascending sort over
+    # all LGs and loci, as [trial][rank]; maxdiff's diffmax and diff20 are ranks -1 and -20
+    result = np.empty((len(store), len(ranks)), dtype=np.int64)
+    for first, chunk in store.chunks(chunk_trials):
+        pooled = pooled_counts(chunk).reshape(len(chunk), -1)
+        result[first:first + len(chunk)] = simstats.order_statistics(pooled, ranks)
+    return result
+
+def lg_totals(store, chunk_trials=CHUNK_TRIALS):
+    # crop allele count per trial, population and LG, summed over loci: [trial][population][LG]
+    result = np.empty((len(store),) + store.trial_shape[:2], dtype=np.int64)
+    for first, chunk in store.chunks(chunk_trials):
+        result[first:first + len(chunk)] = chunk.sum(axis=3, dtype=np.int64)
+    return result
+
+def lg_summary(store, chunk_trials=CHUNK_TRIALS):
+    # mean and variance over trials and populations of each LG's crop allele count, [LG]
+    total = np.zeros(store.trial_shape[1])
+    total_sq = np.zeros(store.trial_shape[1])
+    n = 0
+    for first, chunk in store.chunks(chunk_trials):
+        lgcounts = chunk.sum(axis=3, dtype=np.int64).reshape(-1, store.trial_shape[1])
+        total += lgcounts.sum(axis=0)
+        total_sq += (lgcounts.astype(np.float64)**2).sum(axis=0)
+        n += len(lgcounts)
+    mean = total / n
+    return mean, (total_sq - n * mean**2) / (n - 1)
+
+def locus_histograms(store, chunk_trials=CHUNK_TRIALS):
+    # per pooled locus, how many trials had each crop allele count: [LG * locus][count]
+    populations = store.trial_shape[0]
+    per_population = 2 * store.attrs["sample_size"] if "sample_size" in store.attrs else np.iinfo(store.dtype).max
+    bins = populations * per_population + 1
+    loci = int(np.prod(store.trial_shape[1:]))
+    histograms = np.zeros(loci * bins, dtype=np.int64)
+    offsets = np.arange(loci) * bins
+    for first, chunk in store.chunks(chunk_trials):
+        pooled = pooled_counts(chunk).reshape(len(chunk), loci)
+        histograms += np.bincount((pooled + offsets).ravel(), minlength=len(histograms))
+    return histograms.reshape(loci, bins)
+
+def locus_quantiles(store, qs, chunk_trials=CHUNK_TRIALS):
+    # quantiles over trials of every pooled locus count, [q][LG][locus], as np.quantile's
+    # default linear interpolation; one pass over the store, memory independent of the trials
+    cumulative = np.cumsum(locus_histograms(store, chunk_trials), axis=1)
+    trials = len(store)
+    result = np.empty((len(qs), cumulative.shape[0]))
+    for i, q in enumerate(qs):
+        position = q * (trials - 1)
+        lower = int(np.floor(position))
+        below = (cumulative > lower).argmax(axis=1)  # the sorted value at rank lower
+        above = (cumulative > min(lower + 1, trials - 1)).argmax(axis=1)
+        result[i] = below + (position - lower) * (above - below)
+    return result.reshape((len(qs),) + store.trial_shape[1:])
@@ -0,0 +1,160 @@
+# shardrun.py
+# October 2026.
+# Shard-and-merge runner for maxdiff.py and cropwild2.py across processes or hosts.
+# "init" splits TRIALS into numbered shards of consecutive trials and records them in an
+# SQLite queue next to the shard outputs.  Trial t always draws from
+# parallel.trial_rng(master_seed, t), so the shards are independent and the merged result
+# is the same however the shards are spread.  "work" claims one shard at a time with a lease
+# that is renewed after every parallel.CHUNK_TRIALS trials; the lease of a worker that
+# crashes or hangs runs out and another worker redoes the shard.  A finished shard saves its
+# statistics as a quantile shard (quantiles.py) and "merge" combines them into the report.
+# Hosts sharing the directory can all run "work"; SQLite locking on network file systems
+# varies, so keep the queue on storage with working POSIX locks.
+#     python shardrun.py init runs/a maxdiff --trials 100000 --shard-trials 2000
+#     python shardrun.py work runs/a --processes 8
+#     python shardrun.py merge runs/a
+
+import argparse
+import importlib
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+
+import parallel
+import quantiles
+
+LEASE_SECONDS = 600  # a claimed shard is handed out again when its lease is this old
+
+def connect(rundir):
+    connection = sqlite3.connect(os.path.join(rundir, "queue.sqlite"), timeout=60, isolation_level=None)
+    connection.execute("PRAGMA busy_timeout = 60000")
+    return connection
+
+def shard_path(rundir, shard):
+    return os.path.join(rundir, "shard_%05d.json" % shard)
+
+def init_run(rundir, script, trials, shard_trials, master_seed):
+    os.makedirs(rundir, exist_ok=True)
+    connection = connect(rundir)
+    connection.execute("CREATE TABLE config (script TEXT, trials INTEGER, master_seed TEXT)")
+    connection.execute("CREATE TABLE shards (shard INTEGER PRIMARY KEY, first INTEGER, stop INTEGER, "
+                       "state TEXT, owner TEXT, lease_until REAL)")
+    connection.execute("BEGIN")
+    connection.execute("INSERT INTO config VALUES (?, ?, ?)", (script, trials, str(master_seed)))
+    for shard, first in enumerate(range(0, trials, shard_trials)):
+        connection.execute("INSERT INTO shards VALUES (?, ?, ?, 'todo', NULL, 0)",
+                           (shard, first, min(first + shard_trials, trials)))
+    connection.execute("COMMIT")
+    connection.close()
+
+def read_config(connection):
+    script, trials, master_seed = connection.execute("SELECT script, trials, master_seed FROM config").fetchone()
+    return script, trials, int(master_seed)  # stored as text, master seeds do not fit in SQLite integers
+
+def claim(connection, owner):
+    # (shard, first, stop) of a shard that is not done and not leased, or None
+    connection.execute("BEGIN IMMEDIATE")
+    row = connection.execute("SELECT shard, first, stop FROM shards WHERE state != 'done' AND lease_until < ? "
+                             "ORDER BY shard LIMIT 1", (time.time(),)).fetchone()
+    if row is not None:
+        connection.execute("UPDATE shards SET state = 'running', owner = ?, lease_until = ? WHERE shard = ?",
+                           (owner, time.time() + LEASE_SECONDS, row[0]))
+    connection.execute("COMMIT")
+    return row
+
+def renew(connection, shard, owner):
+    # extends the lease; False if the shard was handed to someone else meanwhile
+    cursor = connection.execute("UPDATE shards SET lease_until = ? WHERE shard = ? AND owner = ? AND state = 'running'",
+                                (time.time() + LEASE_SECONDS, shard, owner))
+    return cursor.rowcount == 1
+
+def finish(connection, shard, owner):
+    cursor = connection.execute("UPDATE shards SET state = 'done' WHERE shard = ? AND owner = ? AND state = 'running'",
+                                (shard, owner))
+    return cursor.rowcount == 1
+
+def run_shard(rundir, connection, module, master_seed, shard, first, stop, owner):
+    accumulators = {name: quantiles.QuantileAccumulator() for name in module.STAT_NAMES}
+    for chunk in range(first, stop, parallel.CHUNK_TRIALS):
+        for stats in module.run_trials(master_seed, chunk, min(chunk + parallel.CHUNK_TRIALS, stop)):
+            for name, value in zip(module.STAT_NAMES, stats):
+                accumulators[name].add(value)
+        if not renew(connection, shard, owner):
+            return False
+    temppath = shard_path(rundir, shard) + ".%s.tmp" % owner
+    quantiles.save_shard(temppath, accumulators)
+    if not finish(connection, shard, owner):
+        os.remove(temppath)
+        return False
+    os.replace(temppath, shard_path(rundir, shard))
+    return True
+
+def work(rundir):
+    # runs shards until none is left to claim
+    owner = "%s-%d" % (socket.gethostname(), os.getpid())
+    connection = connect(rundir)
+    script, trials, master_seed = read_config(connection)
+    module = importlib.import_module(script)
+    module.TRIALS = trials
+    while True:
+        row = claim(connection, owner)
+        if row is None:
+            break
+        shard, first, stop = row
+        if run_shard(rundir, connection, module, master_seed, shard, first, stop, owner):
+            print(owner, "finished shard", shard)
+        else:
+            print(owner, "lost the lease on shard", shard)
+    connection.close()
+
+def status(connection):
+    return dict(connection.execute("SELECT state, COUNT(*) FROM shards GROUP BY state").fetchall())
+
+def merge(rundir):
+    connection = connect(rundir)
+    script, trials, master_seed = read_config(connection)
+    counts = status(connection)
+    shards = [row[0] for row in connection.execute("SELECT shard FROM shards WHERE state = 'done' ORDER BY shard")]
+    connection.close()
+    print(script, "master seed:", master_seed, "shards:", counts)
+    merged = quantiles.merge_shards([shard_path(rundir, shard) for shard in shards])
+    quantiles.report(merged, importlib.import_module(script).upper_rank)
+    quantiles.save_shard(os.path.join(rundir, "merged.json"), merged)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run maxdiff.py or cropwild2.py as shards from a shared queue.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    init = commands.add_parser("init", help="create the shard queue")
+    init.add_argument("rundir", help="directory for the queue and shard outputs")
+    init.add_argument("script", choices=["maxdiff", "cropwild2"], help="model script to run")
+    init.add_argument("--trials", type=int, required=True, help="total trials")
+    init.add_argument("--shard-trials", type=int, default=1000, help="trials per shard (default 1000)")
+    init.add_argument("--seed", type=int, default=None, help="master seed (default: drawn from system entropy)")
+    worker = commands.add_parser("work", help="run shards until the queue is empty")
+    worker.add_argument("rundir")
+    worker.add_argument("--processes", type=int, default=1, help="worker processes on this host (default 1)")
+    report = commands.add_parser("merge", help="merge finished shards and print the intervals")
+    report.add_argument("rundir")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.command == "init":
+        master_seed = args.seed
+        if master_seed is None:
+            master_seed = parallel.new_master_seed()
+        print("master seed:", master_seed)
+        init_run(args.rundir, args.script, args.trials, args.shard_trials, master_seed)
+    elif args.command == "work":
+        processes = [multiprocessing.Process(target=work, args=(args.rundir,)) for k in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    else:
+        merge(args.rundir)
+
+if __name__ == "__main__":
+    main()
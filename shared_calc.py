@@ -0,0 +1,174 @@
+# shared_calc.py
+# October 2026.
+# Given SITES snps and outliers in any number of regions, how many do we expect shared
+# across all, across 2?  Shared by shared_calc_crop.py and shared_calc_wild.py.
+# Every region draws exactly its outlier count of distinct sites (without replacement).
+# Only the overlap counts matter, not which sites are outliers, so a simulation is kept as
+# its Venn cells: cells[b] is the number of sites whose set of regions is exactly the
+# bitmask b.  Each new region draws its outliers from the existing cells with a
+# multivariate hypergeometric draw, done for every simulation at once.  That is exactly
+# the distribution of drawing the sites themselves, at a cost that does not grow with SITES.
+# share_distribution() gives the same null distribution exactly, with no simulation: it
+# follows the number of sites in 0, 1, 2, ... regions through the same hypergeometric
+# draws, summing the probabilities of every outcome instead of sampling one.
+
+import functools
+import itertools
+import math
+
+import numpy as np
+
+import quantiles
+
+RNG = np.random.default_rng()  # default generator when the caller does not pass one
+LOG_FACTORIALS = np.zeros(1)  # log(n!) for n = 0, 1, ..., extended on demand and kept between queries
+PRUNE_PROB = 1e-30  # share_distribution() skips outcomes less likely than this
+
+def venn_cells(outliers, sites, sims, rng=None):
+    # [sim][bitmask] site counts, bit r set for sites among the outliers of region r
+    if rng is None:
+        rng = RNG
+    if max(outliers) > sites:
+        raise ValueError("a region cannot have more outliers than there are sites")
+    cells = np.zeros((sims, 2**len(outliers)), dtype=np.int64)
+    cells[:, 0] = sites
+    for region, count in enumerate(outliers):
+        remaining = np.full(sims, count, dtype=np.int64)  # outliers of this region still to place
+        left = np.full(sims, sites, dtype=np.int64)  # sites in the cells not yet drawn from
+        for b in range(2**region):
+            # multivariate hypergeometric as a chain: draw from cell b against all later cells
+            left -= cells[:, b]
+            taken = rng.hypergeometric(cells[:, b], left, remaining)
+            cells[:, b] -= taken
+            cells[:, b | 1 << region] = taken
+            remaining -= taken
+    return cells
+
+def region_groups(regions):
+    # every group of two or more regions, as tuples of region indices
+    groups = []
+    for size in range(2, regions + 1):
+        groups.extend(itertools.combinations(range(regions), size))
+    return groups
+
+def overlap_counts(outliers, sites, sims, rng=None):
+    # sites shared by every group of regions from region_groups(), one count per simulation:
+    # {group: int array [sim]}
+    cells = venn_cells(outliers, sites, sims, rng)
+    counts = {}
+    for group in region_groups(len(outliers)):
+        groupbits = sum(1 << region for region in group)
+        containing = [b for b in range(cells.shape[1]) if b & groupbits == groupbits]
+        counts[group] = cells[:, containing].sum(axis=1)
+    return counts
+
+def get_share(outliers, sites, sims, rng=None):
+    # summed pairwise overlaps and overlap of all regions, one of each per simulation
+    counts = overlap_counts(outliers, sites, sims, rng)
+    share2 = sum(counts[group] for group in itertools.combinations(range(len(outliers)), 2))
+    return share2, counts[tuple(range(len(outliers)))]
+
+def log_binomial(n, k):
+    global LOG_FACTORIALS
+    if len(LOG_FACTORIALS) <= np.max(n):
+        LOG_FACTORIALS = np.array([math.lgamma(m + 1) for m in range(np.max(n) + 1)])
+    return LOG_FACTORIALS[n] - LOG_FACTORIALS[k] - LOG_FACTORIALS[n - k]
+
+def likely_range(total, size, count):
+    # draws from a class of size items, out of count drawn from total, with probability of at least PRUNE_PROB
+    taken = np.arange(max(0, count - (total - size)), min(size, count) + 1)
+    logp = log_binomial(size, taken) + log_binomial(total - size, count - taken) - log_binomial(total, count)
+    likely = taken[logp >= np.log(PRUNE_PROB)]
+    return likely[0], likely[-1]
+
+def hypergeometric_draws(sizes, count):
+    # every likely way of drawing count items without replacement from classes of the given
+    # sizes: draws [way][class] and the log probability of each way.  No way is more likely
+    # than its draw from any one class, so a class draw below PRUNE_PROB rules the way out.
+    total = sum(sizes)
+    draws = np.zeros((1, 0), dtype=np.int64)
+    used = np.zeros(1, dtype=np.int64)
+    logp = np.zeros(1)
+    for size in sizes[1:]:  # class 0 takes whatever is left
+        low, high = likely_range(total, size, count)
+        ways = np.maximum(np.minimum(high, count - used) - low + 1, 0)
+        partial = np.repeat(np.arange(len(used)), ways)
+        taken = low + np.arange(ways.sum()) - np.repeat(np.cumsum(ways) - ways, ways)
+        draws = np.column_stack([draws[partial], taken])
+        used = used[partial] + taken
+        logp = logp[partial] + log_binomial(size, taken)
+    rest = count - used
+    fits = rest <= sizes[0]
+    draws = np.column_stack([rest, draws])[fits]
+    logp = logp[fits] + log_binomial(sizes[0], rest[fits]) - log_binomial(total, count)
+    return draws, logp
+
+@functools.lru_cache(maxsize=None)
+def share_distribution(outliers, sites):
+    # exact probability mass functions of get_share()'s summed pairwise overlaps and overlap
+    # of all regions, indexed by count; outliers is a tuple.  The state after r regions is
+    # the number of sites in exactly 0..r of them; the result is cached and read-only.
+    # Outcomes below PRUNE_PROB are dropped, which leaves the quantiles unchanged.
+    if max(outliers) > sites:
+        raise ValueError("a region cannot have more outliers than there are sites")
+    states = np.array([[sites]], dtype=np.int64)
+    probs = np.ones(1)
+    for count in outliers:
+        newstates = []
+        newprobs = []
+        for state, prob in zip(states, probs):
+            draws, logp = hypergeometric_draws(state, count)
+            newstate = np.zeros((len(draws), len(state) + 1), dtype=np.int64)
+            newstate[:, :-1] = state - draws
+            newstate[:, 1:] += draws  # drawn sites move up one region
+            newprob = prob * np.exp(logp)
+            likely = newprob >= PRUNE_PROB
+            newstates.append(newstate[likely])
+            newprobs.append(newprob[likely])
+        states, inverse = np.unique(np.concatenate(newstates), axis=0, return_inverse=True)
+        probs = np.bincount(inverse.ravel(), weights=np.concatenate(newprobs))
+    regions = np.arange(len(outliers) + 1)
+    share2 = states @ (regions * (regions - 1) // 2)  # a site in m regions is in m choose 2 pairs
+    shareall = states[:, -1]
+    share2_pmf = np.bincount(share2, weights=probs)
+    shareall_pmf = np.bincount(shareall, weights=probs)
+    share2_pmf.setflags(write=False)
+    shareall_pmf.setflags(write=False)
+    return share2_pmf, shareall_pmf
+
+def pmf_quantile(pmf, q):
+    # smallest count whose cumulative probability exceeds q, what sorted[int(sims*q)] estimates
+    return int(np.searchsorted(np.cumsum(pmf), q, side="right"))
+
+def simulate_until(outliers, sites, batch, tolerance, max_sims, rng=None):
+    # simulates batches of batch sims until the 95% intervals of both bounds of both
+    # statistics are at most tolerance wide, or max_sims is reached
+    accumulators = {"share2": quantiles.QuantileAccumulator(), "shareall": quantiles.QuantileAccumulator()}
+    targets = [(name, q) for name in accumulators for q in (.025, .975)]
+    while accumulators["share2"].count < max_sims:
+        for name, shares in zip(accumulators, get_share(outliers, sites, batch, rng)):
+            for value, count in zip(*np.unique(shares, return_counts=True)):
+                accumulators[name].add(value, int(count))
+        if quantiles.converged(accumulators, targets, tolerance):
+            break
+    return accumulators
+
+def main(outliers, sites, sims, exact=True, tolerance=None, max_sims=10**7):
+    if exact:
+        share2_pmf, shareall_pmf = share_distribution(tuple(outliers), sites)
+        print("lower, upper95% CI share " + str(len(outliers)) + ": ", pmf_quantile(shareall_pmf, .025), pmf_quantile(shareall_pmf, .975))
+        print("lower, upper 95% CI share 2 upper", pmf_quantile(share2_pmf, .025), pmf_quantile(share2_pmf, .975))
+        return
+    if tolerance is not None:
+        accumulators = simulate_until(outliers, sites, sims, tolerance, max_sims)
+        share2s = accumulators["share2"]
+        shareall = accumulators["shareall"]
+        print("sims used:", share2s.count)
+        print("lower, upper95% CI share " + str(len(outliers)) + ": ", shareall.quantile(.025), shareall.quantile(.975))
+        print("lower, upper 95% CI share 2 upper", share2s.quantile(.025), share2s.quantile(.975))
+        return
+    s2list, salllist = get_share(outliers, sites, sims)
+    s2list.sort()
+    salllist.sort()
+    print("lower, upper95% CI share " + str(len(outliers)) + ": ", salllist[int(sims*.025)], salllist[int(sims*.975)])
+    print("lower, upper 95% CI share 2 upper", s2list[int(sims*.025)], s2list[int(sims*.975)])
@@ -0,0 +1,36 @@
+# simstats.py
+# October 2026.
+# Trial statistics of maxdiff.py and cropwild2.py, computed for a whole array of trials at once.
+# Frequencies come as [trial][replicate][LG] for the between-LG tests, or [trial][value] for
+# order statistics; any leading axes work in place of the single trial axis.
+
+import numpy as np
+
+def anova_f(freqs):
+    # F for differences between LGs, with the replicates as observations, as the scripts have
+    # always computed it: (SSG / (LG - 1)) / (SSE / (LG * (replicates - 1))), SSG summed over
+    # the LG means without weighting by the replicates per LG
+    replicates, lg_count = freqs.shape[-2:]
+    if replicates < 2 or lg_count < 2:
+        raise ValueError("the F statistic needs at least 2 replicates and 2 LGs, not %d and %d" % (replicates, lg_count))
+    lgmeans = freqs.mean(axis=-2)
+    grandmeans = lgmeans.mean(axis=-1, keepdims=True)
+    ssg = ((lgmeans - grandmeans)**2).sum(axis=-1)
+    sse = ((freqs - lgmeans[..., np.newaxis, :])**2).sum(axis=(-2, -1))
+    return (ssg / (lg_count - 1)) / (sse / (lg_count * (replicates - 1)))
+
+def max_min_diff(freqs):
+    # highest minus lowest LG mean over the replicates
+    lgmeans = freqs.mean(axis=-2)
+    return lgmeans.max(axis=-1) - lgmeans.min(axis=-1)
+
+def order_statistics(values, ranks):
+    # values at the given positions of each trial's ascending sort, as [trial][rank];
+    # np.partition only places the requested ranks instead of sorting everything; negative
+    # ranks count from the top as in indexing, and ranks outside the values raise IndexError
+    n = values.shape[-1]
+    for rank in ranks:
+        if not -n <= rank < n:
+            raise IndexError("rank %d is out of range for %d values" % (rank, n))
+    ranks = [rank + n if rank < 0 else rank for rank in ranks]
+    return np.partition(values, ranks, axis=-1)[..., ranks]
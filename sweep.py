@@ -0,0 +1,134 @@
+# sweep.py
+# October 2026.
+# Parameter sweeps over the module constants of maxdiff.py or cropwild2.py, without editing them.
+# The grid is a JSON file mapping constant names to lists of values, for example
+#     {"F1_RATE": [0.01, 0.05, 0.1], "NPOP": [100, 1000], "GENE_FLOW_LIST": [[0, 4], [0, 4, 7]]}
+# and every combination is one parameter point.  Each point runs the script's own
+# run_trials() in chunks of parallel.CHUNK_TRIALS trials; the chunks of all points share one
+# process pool and are queued cheapest point first (by the script's trial_cost()), so small
+# points finish early.  There is one row per (point, trial), with the point's parameters and
+# the script's STAT_NAMES as columns.  Rows follow the schedule, cheapest point first and
+# trials in order within a point, whatever order the workers finish in, so the table is the
+# same for any --workers; a chunk's rows are written as soon as every chunk scheduled before
+# it is done, so the cheap points' results can be read early.
+# Genotype dumps are turned off (OUTPUT_POLICY "never"): every point would write the same
+# GENOTYPE_FILE, from several worker processes at once.
+# Trial t of every point uses the same RNG stream, parallel.trial_rng(seed, t), so
+# differences between points are not blurred by different random draws.
+
+import argparse
+import concurrent.futures
+import csv
+import importlib
+import itertools
+import json
+
+import parallel
+
+DEFAULTS = {}  # script -> its constants as first imported, restored before each point's overrides
+FORCED = {"OUTPUT_POLICY": "never"}  # constants every point runs with, where the script has them
+
+def load_script(script, overrides):
+    # the script's module with the defaults restored and overrides applied
+    module = importlib.import_module(script)
+    if script not in DEFAULTS:
+        DEFAULTS[script] = {name: value for name, value in vars(module).items() if name.isupper()}
+    for name in overrides:
+        if name not in DEFAULTS[script]:
+            raise ValueError("%s has no constant %s" % (script, name))
+    for name, value in DEFAULTS[script].items():
+        setattr(module, name, value)
+    for name, value in overrides.items():
+        setattr(module, name, value)
+    return module
+
+def grid_points(grid):
+    # every combination of the grid values, as one overrides dict per point
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def point_overrides(script, point):
+    # the point's overrides plus FORCED
+    load_script(script, {})
+    for name in FORCED:
+        if name in point:
+            raise ValueError("sweeps always run with %s = %r, it cannot be in the grid" % (name, FORCED[name]))
+    forced = {name: value for name, value in FORCED.items() if name in DEFAULTS[script]}
+    return dict(point, **forced)
+
+def run_unit(script, overrides, master_seed, first, stop):  # work unit, one chunk of one point
+    return load_script(script, overrides).run_trials(master_seed, first, stop)
+
+def schedule(script, points, trials):
+    # (point index, overrides, first, stop) for every chunk, cheapest points first
+    costs = [load_script(script, overrides).trial_cost() for overrides in points]
+    units = []
+    for index in sorted(range(len(points)), key=lambda index: costs[index]):
+        overrides = dict(point_overrides(script, points[index]), TRIALS=trials)
+        for first in range(0, trials, parallel.CHUNK_TRIALS):
+            units.append((index, overrides, first, min(first + parallel.CHUNK_TRIALS, trials)))
+    return units
+
+def iter_results(script, units, master_seed, workers=1):
+    # yields (point index, first trial, results) for each unit as it finishes
+    if workers == 1:
+        for index, overrides, first, stop in units:
+            yield index, first, run_unit(script, overrides, master_seed, first, stop)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for index, overrides, first, stop in units:  # the pool starts them in submission order
+            futures[executor.submit(run_unit, script, overrides, master_seed, first, stop)] = (index, first)
+        for future in concurrent.futures.as_completed(futures):
+            index, first = futures[future]
+            yield index, first, future.result()
+
+def cell(value):
+    if isinstance(value, (list, tuple, dict)):
+        return json.dumps(value)
+    return value
+
+def run_sweep(script, grid, trials, master_seed, outpath, workers=1):
+    points = grid_points(grid)
+    units = schedule(script, points, trials)
+    stat_names = load_script(script, {}).STAT_NAMES
+    with open(outpath, "w", newline="") as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(["point"] + list(grid) + ["trial"] + list(stat_names))
+        order = [(index, first) for index, overrides, first, stop in units]  # schedule order
+        pending = {}  # (point index, first trial) -> results of chunks not written yet
+        written = finished = 0
+        for index, first, results in iter_results(script, units, master_seed, workers):
+            pending[index, first] = results
+            finished += 1
+            while written < len(order) and order[written] in pending:  # write every chunk that is next in the schedule
+                index, first = order[written]
+                params = [cell(points[index][name]) for name in grid]
+                for trial, stats in enumerate(pending.pop((index, first)), first):
+                    writer.writerow([index] + params + [trial] + list(stats))
+                written += 1
+            outfile.flush()  # partial results can be read while the sweep runs
+            print("chunks done: ", finished, "of", len(units))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run maxdiff.py or cropwild2.py over a grid of parameter values.")
+    parser.add_argument("script", choices=["maxdiff", "cropwild2"], help="model script to sweep")
+    parser.add_argument("grid", help="JSON file mapping constant names to lists of values")
+    parser.add_argument("--trials", type=int, required=True, help="trials per parameter point")
+    parser.add_argument("--out", default="sweep.csv", help="results table (default sweep.csv)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default 1)")
+    parser.add_argument("--seed", type=int, default=None, help="master seed (default: drawn from system entropy)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    master_seed = args.seed
+    if master_seed is None:
+        master_seed = parallel.new_master_seed()
+    print("master seed:", master_seed)
+    with open(args.grid) as gridfile:
+        grid = json.load(gridfile)
+    run_sweep(args.script, grid, args.trials, master_seed, args.out, args.workers)
+
+if __name__ == "__main__":
+    main()
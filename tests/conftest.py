@@ -0,0 +1,27 @@
+# conftest.py
+# October 2026.
+# The modules live flat in the repository root; tests import them from there.
+# The script fixture configures maxdiff.py or cropwild2.py through sweep.load_script() and
+# restores the module's constants afterwards, so one test's model never leaks into another.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sweep
+
+SMALL_MODEL = {"NPOP": 30, "LG_COUNT": 3, "LOCI_PER_LG": 20, "YEARS": 6, "GENE_FLOW_LIST": [0, 2],
+               "F1_RATE": 0.1, "SAMPLE_SIZE": 10}  # fast enough to run many trials per test
+
+@pytest.fixture
+def script():
+    loaded = []
+    def load(name, **overrides):
+        loaded.append(name)
+        return sweep.load_script(name, dict(SMALL_MODEL, **overrides))
+    yield load
+    for name in loaded:
+        sweep.load_script(name, {})
@@ -0,0 +1,86 @@
+# test_backends.py
+# October 2026.
+# Every backend must draw from the same distributions as the original string model
+# (baseline.py).  Each check compares allele-frequency distributions with a two-sample KS
+# test (bench.py) at fixed seeds, so it is repeatable.  The baseline has no genetic maps or
+# selection; with those the numpy backend is checked against the python backend instead.
+
+import numpy as np
+import pytest
+
+import bench
+
+def assert_same_distributions(reference, samples):
+    for name, values in samples.items():
+        d, p = bench.ks_2samp(reference[name], values)
+        assert p >= bench.KS_ALPHA, "%s differs from the reference: KS D %.4f p %.6f" % (name, d, p)
+
+@pytest.fixture(scope="module")
+def baseline_samples():
+    return bench.frequency_samples(bench.sampled_genomes("baseline", bench.CHECK_REPLICATES, 1))
+
+@pytest.mark.parametrize("backend", bench.BACKENDS)
+def test_backend_matches_baseline(backend, baseline_samples):
+    samples = bench.frequency_samples(bench.sampled_genomes(backend, bench.CHECK_REPLICATES, 2))
+    assert_same_distributions(baseline_samples, samples)
+
+def write_map(path, lg_count, loci):
+    # a map with a hot spot in the middle of every LG
+    with open(path, "w") as mapfile:
+        for lg in range(1, lg_count + 1):
+            cm = 0.0
+            for locus in range(1, loci + 1):
+                mapfile.write("%d %d %f\n" % (lg, locus, cm))
+                cm += 10.0 if locus == loci // 2 else 0.5
+
+@pytest.mark.parametrize("option", ["genetic_map", "selection"])
+def test_numpy_matches_python_with_options(option, tmp_path, monkeypatch):
+    model = dict(bench.CHECK_MODEL)
+    if option == "genetic_map":
+        path = str(tmp_path / "map.txt")
+        write_map(path, model["LG_COUNT"], model["LOCI_PER_LG"])
+        model["GENETIC_MAP"] = path
+    else:
+        model["SELECTION"] = [(0, 0, 25, 0.5), (2, 10, 20, 1.0)]
+    monkeypatch.setattr(bench, "CHECK_MODEL", model)
+    try:
+        reference = bench.frequency_samples(bench.sampled_genomes("python", bench.CHECK_REPLICATES, 1))
+        samples = bench.frequency_samples(bench.sampled_genomes("numpy", bench.CHECK_REPLICATES, 2))
+    finally:
+        bench.sweep.load_script("maxdiff", {})
+    assert_same_distributions(reference, samples)
+
+def test_trials_repeat_from_their_seed(script):
+    # trial t draws from its own RNG stream, so any chunking gives the same trials
+    for backend in ("python", "numpy"):
+        module = script("maxdiff", BACKEND=backend, POPULATIONS=3)
+        whole = module.run_trials(11, 0, 4)
+        assert module.run_trials(11, 2, 4) == whole[2:]
+
+@pytest.mark.parametrize("gene_flow_list", [[], [12], [0, 12]])
+def test_pedigree_matches_numpy_with_flows_outside_the_years(gene_flow_list, monkeypatch):
+    # CHECK_MODEL runs 10 years, so year 12 never comes
+    monkeypatch.setattr(bench, "CHECK_MODEL", dict(bench.CHECK_MODEL, GENE_FLOW_LIST=gene_flow_list))
+    try:
+        reference = bench.sampled_genomes("numpy", bench.CHECK_REPLICATES, 1)
+        genomes = bench.sampled_genomes("pedigree", bench.CHECK_REPLICATES, 2)
+    finally:
+        bench.sweep.load_script("maxdiff", {})
+    assert genomes.shape == reference.shape
+    if not gene_flow_list or min(gene_flow_list) >= bench.CHECK_MODEL["YEARS"]:
+        assert not reference.any() and not genomes.any()
+    else:
+        assert_same_distributions(bench.frequency_samples(reference), bench.frequency_samples(genomes))
+
+def test_sample_counts_match_calc_lg_freqs(script):
+    # the python backend's pooled locus frequencies against the original string code
+    module = script("maxdiff", BACKEND="python", POPULATIONS=3, LOCI_PER_LG=13)
+    for name in ("LG_COUNT", "LOCI_PER_LG", "POPULATIONS", "SAMPLE_SIZE"):
+        setattr(bench.baseline, name, getattr(module, name))
+    simlist = next(module.iter_simlists(3, 0, 1))
+    strings = [[[["".join(str((bits >> j) & 1) for j in range(module.LOCI_PER_LG)) for bits in chromo]
+                 for chromo in individual] for individual in population] for population in simlist]
+    expected = bench.baseline.calc_lg_freqs([], strings)
+    assert module.lg_freqs(module.sample_counts(simlist)[np.newaxis])[0].tolist() == expected
+    stats = module.trial_stats(module.sample_counts(simlist)[np.newaxis])[0]
+    assert stats == (sorted(expected)[-1], sorted(expected)[-20])
@@ -0,0 +1,91 @@
+# test_checkpoint.py
+# October 2026.
+
+import json
+
+import numpy as np
+import pytest
+
+import checkpoint
+import quantiles
+import replistore
+
+def accumulate(values):
+    accumulator = quantiles.QuantileAccumulator()
+    for value in values:
+        accumulator.add(value)
+    return accumulator
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "run.ckpt")
+    model = {"npop": 30, "gene_flow_list": (0, 2), "backend": "numpy"}
+    checkpoint.save_checkpoint(path, "maxdiff", 42, 100, 37, {"diffmax": accumulate([.1, .2, .2])}, model)
+    master_seed, next_trial, accumulators = checkpoint.load_checkpoint(path, "maxdiff", 100, model)
+    assert (master_seed, next_trial) == (42, 37)
+    assert accumulators["diffmax"].count == 3
+    assert accumulators["diffmax"].order_statistic(2) == .2
+
+@pytest.mark.parametrize("script, trials, model", [
+    ("cropwild2", 100, {"npop": 30}),
+    ("maxdiff", 200, {"npop": 30}),
+    ("maxdiff", 100, {"npop": 31}),
+    ("maxdiff", 100, None),
+])
+def test_load_refuses_another_run(tmp_path, script, trials, model):
+    path = str(tmp_path / "run.ckpt")
+    checkpoint.save_checkpoint(path, "maxdiff", 42, 100, 37, {}, {"npop": 30})
+    with pytest.raises(ValueError):
+        checkpoint.load_checkpoint(path, script, trials, model)
+
+def test_sync_runs_before_every_save(tmp_path):
+    path = str(tmp_path / "run.ckpt")
+    saved = []
+    def sync():
+        try:
+            with open(path) as checkfile:
+                saved.append(json.load(checkfile)["next_trial"])
+        except FileNotFoundError:
+            saved.append(None)
+    checkpointer = checkpoint.Checkpointer(path, "maxdiff", 42, 100, 0, {}, sync)
+    checkpointer.save(10, {})
+    checkpointer.maybe_save(20, {})
+    assert saved == [None, 10]  # each sync still sees the previous checkpoint
+
+def run_main(module, monkeypatch, *args):
+    monkeypatch.setattr("sys.argv", ["maxdiff", "test"] + list(args))
+    module.main()
+
+def test_resumed_run_matches_uninterrupted(script, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    module = script("maxdiff", TRIALS=12, POPULATIONS=3, STORE_FILE=str(tmp_path / "whole.bin"))
+    run_main(module, monkeypatch, "--seed", "5")
+    whole = capsys.readouterr().out.splitlines()[-3:]
+    whole_counts = replistore.ReplicateStore(str(tmp_path / "whole.bin")).array().copy()
+
+    # a run killed after its checkpoint at trial 5, with two more trials already in its store
+    module.STORE_FILE = str(tmp_path / "part.bin")
+    store = module.open_store(5, 0)
+    for counts in module.run_counts(5, 0, 7):
+        store.append(counts)
+    store.close()
+    stats = module.run_trials(5, 0, 5)
+    accumulators = {"diffmax": accumulate(s[0] for s in stats), "diff20": accumulate(s[1] for s in stats)}
+    checkpoint.save_checkpoint(str(tmp_path / "run.ckpt"), "maxdiff", 5, 12, 5, accumulators, module.run_fields())
+
+    run_main(module, monkeypatch, "--checkpoint", str(tmp_path / "run.ckpt"), "--resume")
+    assert capsys.readouterr().out.splitlines()[-3:] == whole
+    np.testing.assert_array_equal(replistore.ReplicateStore(str(tmp_path / "part.bin")).array(), whole_counts)
+
+def test_resume_refuses_short_store(script, tmp_path, monkeypatch):
+    # the checkpoint counts trials the store never got to disk
+    monkeypatch.chdir(tmp_path)
+    module = script("maxdiff", TRIALS=12, POPULATIONS=3, STORE_FILE=str(tmp_path / "part.bin"))
+    store = module.open_store(5, 0)
+    for counts in module.run_counts(5, 0, 3):
+        store.append(counts)
+    store.close()
+    accumulators = {"diffmax": quantiles.QuantileAccumulator(), "diff20": quantiles.QuantileAccumulator()}
+    checkpoint.save_checkpoint(str(tmp_path / "run.ckpt"), "maxdiff", 5, 12, 5, accumulators, module.run_fields())
+    with pytest.raises(ValueError):
+        run_main(module, monkeypatch, "--checkpoint", str(tmp_path / "run.ckpt"), "--resume")
+    assert len(replistore.ReplicateStore(str(tmp_path / "part.bin"))) == 3
@@ -0,0 +1,75 @@
+# test_genowriter.py
+# October 2026.
+
+import threading
+
+import numpy as np
+import pytest
+
+import genowriter
+
+GENOS = [[0, 1, 2, 0, 2], [2, 2, 1, 0, 1], [1, 0, 0, 2, 0]]  # 3 loci of 5 individuals
+
+def decode_bed(data, individuals):
+    # crop allele counts [locus][individual] from SNP-major .bed bytes
+    assert data[:3] == genowriter.BED_MAGIC
+    per_locus = -(-individuals // 4)
+    packed = np.frombuffer(data[3:], dtype=np.uint8).reshape(-1, per_locus)
+    codes = (packed[:, :, np.newaxis] >> np.array([0, 2, 4, 6])) & 0b11
+    counts = {0b11: 0, 0b10: 1, 0b00: 2}
+    return [[counts[code] for code in row[:individuals]] for row in codes.reshape(len(packed), -1).tolist()]
+
+def write(path, fmt, rows=GENOS, loci_per_lg=2):
+    with genowriter.GenotypeWriter(str(path), loci_per_lg, fmt) as writer:
+        for indgenos in rows:
+            writer.writerow(indgenos)
+    return writer
+
+def test_text_rows(tmp_path):
+    write(tmp_path / "g.txt", "text")
+    assert (tmp_path / "g.txt").read_text() == "0 1 2 0 2\n2 2 1 0 1\n1 0 0 2 0\n"
+
+def test_plink_encoding(tmp_path):
+    write(tmp_path / "g.txt", "plink")
+    assert not (tmp_path / "g.txt").exists()
+    data = (tmp_path / "g.bed").read_bytes()
+    assert len(data) == 3 + 3 * 2  # magic, then 2 bytes per locus for 5 individuals
+    assert data[3] == 0b11_00_10_11  # individuals 1-4 of locus 1 (0, 1, 2, 0 crop alleles) from the low bits up
+    assert decode_bed(data, 5) == GENOS
+    assert (tmp_path / "g.bim").read_text().splitlines() == [
+        "1 lg1_1 0 1 C W", "1 lg1_2 0 2 C W", "2 lg2_1 0 1 C W"]
+    assert (tmp_path / "g.fam").read_text().splitlines()[4] == "pop ind5 0 0 0 -9"
+
+def test_chunked_writes_match(tmp_path, monkeypatch):
+    rows = np.random.default_rng(1).integers(0, 3, size=(23, 9)).tolist()
+    write(tmp_path / "one.txt", "both", rows)
+    monkeypatch.setattr(genowriter, "CHUNK_ROWS", 4)
+    write(tmp_path / "many.txt", "both", rows)
+    for ext in (".txt", ".bed", ".bim"):
+        assert (tmp_path / ("one" + ext)).read_bytes() == (tmp_path / ("many" + ext)).read_bytes()
+    assert decode_bed((tmp_path / "many.bed").read_bytes(), 9) == rows
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        genowriter.GenotypeWriter(str(tmp_path / "g.txt"), 2, "vcf")
+
+def test_background_writer_runs_every_job():
+    written = []
+    writer = genowriter.BackgroundWriter(written.append, max_pending=100)
+    for job in range(10):
+        writer.submit(job)
+    writer.close()
+    assert written == list(range(10))
+
+def test_background_writer_reports_errors():
+    release = threading.Event()
+    def fail(job):
+        release.wait()
+        raise OSError("disk full")
+    writer = genowriter.BackgroundWriter(fail, max_pending=1)
+    for job in range(4):
+        writer.submit(job)  # the queue fills while the first job waits
+    release.set()
+    with pytest.raises(OSError):
+        writer.close()
+    assert writer.dropped >= 1
@@ -0,0 +1,49 @@
+# test_quantiles.py
+# October 2026.
+
+import numpy as np
+import pytest
+
+import quantiles
+
+def accumulate(values, **options):
+    accumulator = quantiles.QuantileAccumulator(**options)
+    for value in values:
+        accumulator.add(value)
+    return accumulator
+
+def test_exact_matches_sorted_values():
+    values = np.random.default_rng(1).integers(0, 50, 1000) / 50
+    accumulator = accumulate(values)
+    assert accumulator.sketch is None
+    ordered = np.sort(values)
+    for rank in (0, 1, 24, 500, 974, 999):
+        assert accumulator.order_statistic(rank) == ordered[rank]
+    for q in (.025, .5, .975):
+        assert accumulator.quantile(q) == ordered[int(q * len(values))]
+
+def test_sketch_within_relative_error():
+    values = np.random.default_rng(2).lognormal(size=5000)
+    accumulator = accumulate(values, max_exact=100)
+    assert accumulator.sketch is not None
+    ordered = np.sort(values)
+    for rank in (0, 50, 2500, 4875, 4999):
+        assert accumulator.order_statistic(rank) == pytest.approx(ordered[rank], rel=2 * accumulator.alpha)
+
+@pytest.mark.parametrize("max_exact", [quantiles.MAX_EXACT_VALUES, 100])
+def test_merged_shards_match_one_run(tmp_path, max_exact):
+    values = np.random.default_rng(3).lognormal(size=3000)
+    paths = []
+    for k, part in enumerate(np.array_split(values, 3)):
+        paths.append(str(tmp_path / ("shard%d.json" % k)))
+        quantiles.save_shard(paths[-1], {"stat": accumulate(part, max_exact=max_exact)})
+    merged = quantiles.merge_shards(paths)["stat"]
+    whole = accumulate(values, max_exact=max_exact)
+    assert merged.count == whole.count
+    for rank in (0, 74, 1500, 2924, 2999):
+        assert merged.order_statistic(rank) == pytest.approx(whole.order_statistic(rank), rel=2 * whole.alpha)
+
+def test_scripts_report_their_own_upper_rank(script):
+    assert script("maxdiff").upper_rank(1000) == 975
+    assert script("cropwild2").upper_rank(1000) == 974
+    assert quantiles.upper_rank(1000) == 975
@@ -0,0 +1,44 @@
+# test_replicache.py
+# October 2026.
+
+import os
+
+import numpy as np
+
+import replicache
+
+def entry_bytes(cache):
+    return sum(os.path.getsize(path) for path in cache.entries())
+
+def test_get_returns_put_counts(tmp_path):
+    cache = replicache.ReplicateCache(str(tmp_path), 10**6)
+    key = replicache.cache_key({"npop": 30, "trial": 0})
+    assert cache.get(key) is None
+    cache.put(key, np.arange(12).reshape(3, 4))
+    np.testing.assert_array_equal(cache.get(key), np.arange(12).reshape(3, 4))
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_size_counts_existing_and_overwritten_entries(tmp_path):
+    first = replicache.ReplicateCache(str(tmp_path), 10**6)
+    first.put("ab" * 32, np.arange(100))
+    cache = replicache.ReplicateCache(str(tmp_path), 10**6)
+    assert cache.total_bytes is None  # opening does not scan the directory
+    for k in range(3):
+        cache.put("cd" * 32, np.arange(100))
+    assert cache.total_bytes == entry_bytes(cache)
+
+def test_eviction_keeps_the_cap(tmp_path):
+    cache = replicache.ReplicateCache(str(tmp_path), 2000)
+    for k in range(20):
+        cache.put(replicache.cache_key({"trial": k}), np.arange(100))
+    assert cache.total_bytes == entry_bytes(cache) <= 2000
+
+def test_open_cache_once_per_process(tmp_path):
+    assert replicache.open_cache(str(tmp_path), 10**6) is replicache.open_cache(str(tmp_path), 10**6)
+
+def test_cached_trials_match_simulated(script, tmp_path):
+    module = script("maxdiff", POPULATIONS=3)
+    simulated = module.run_trials(8, 0, 5)
+    module.CACHE_DIR = str(tmp_path)
+    assert module.run_trials(8, 0, 3) == simulated[:3]
+    assert module.run_trials(8, 0, 5) == simulated  # trials 0-2 from the cache
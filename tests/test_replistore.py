@@ -0,0 +1,89 @@
+# test_replistore.py
+# October 2026.
+
+import numpy as np
+import pytest
+
+import replistore
+
+SHAPE = (3, 2, 5)  # populations, LGs, loci
+
+def make_store(path, trials, seed=0, sample_size=4):
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(0, 2 * sample_size + 1, size=(trials,) + SHAPE)
+    store = replistore.ReplicateStore.create(str(path), SHAPE, np.uint8, {"sample_size": sample_size})
+    for trial in counts:
+        store.append(trial)
+    store.close()
+    return counts
+
+def test_append_and_reopen(tmp_path):
+    counts = make_store(tmp_path / "store.bin", 7)
+    store = replistore.ReplicateStore(str(tmp_path / "store.bin"))
+    assert len(store) == 7
+    assert store.attrs == {"sample_size": 4}
+    np.testing.assert_array_equal(store.array(), counts)
+
+def test_append_checks_shape_and_range(tmp_path):
+    store = replistore.ReplicateStore.create(str(tmp_path / "store.bin"), SHAPE, np.uint8)
+    with pytest.raises(ValueError):
+        store.append(np.zeros((2, 2, 5)))
+    with pytest.raises(ValueError):
+        store.append(np.full(SHAPE, 256))
+
+def test_sync_makes_appends_visible(tmp_path):
+    store = replistore.ReplicateStore.create(str(tmp_path / "store.bin"), SHAPE, np.uint8)
+    store.append(np.ones(SHAPE))
+    store.sync()
+    assert len(replistore.ReplicateStore(str(tmp_path / "store.bin"))) == 1
+    store.close()
+
+def test_truncate_then_append(tmp_path):
+    path = str(tmp_path / "store.bin")
+    counts = make_store(path, 6)
+    store = replistore.ReplicateStore(path)
+    store.truncate(4)
+    assert len(store) == 4
+    store.append(counts[0])
+    store.close()
+    reopened = replistore.ReplicateStore(path)
+    np.testing.assert_array_equal(reopened.array(), np.concatenate([counts[:4], counts[:1]]))
+
+def test_truncate_never_extends(tmp_path):
+    path = str(tmp_path / "store.bin")
+    make_store(path, 3)
+    store = replistore.ReplicateStore(path)
+    with pytest.raises(ValueError):
+        store.truncate(5)
+    assert len(store) == 3
+
+def test_partial_trial_is_ignored(tmp_path):
+    # a crash in the middle of a write leaves a store readable up to its last whole trial
+    path = str(tmp_path / "store.bin")
+    counts = make_store(path, 3)
+    with open(path, "ab") as datafile:
+        datafile.write(b"\x01\x02")
+    store = replistore.ReplicateStore(path)
+    assert len(store) == 3
+    np.testing.assert_array_equal(store.array(), counts)
+
+def test_order_statistics(tmp_path):
+    path = str(tmp_path / "store.bin")
+    counts = make_store(path, 9)
+    pooled = counts.sum(axis=1).reshape(9, -1)
+    result = replistore.order_statistics(replistore.ReplicateStore(path), [-1, -3], chunk_trials=4)
+    np.testing.assert_array_equal(result, np.sort(pooled, axis=1)[:, [-1, -3]])
+
+@pytest.mark.parametrize("attrs", [True, False])
+def test_locus_quantiles_match_numpy(tmp_path, attrs):
+    path = str(tmp_path / "store.bin")
+    counts = make_store(path, 101, seed=3)
+    if not attrs:  # stores without a sample size fall back to the dtype's range
+        store = replistore.ReplicateStore.create(path, SHAPE, np.uint8)
+        for trial in counts:
+            store.append(trial)
+        store.close()
+    qs = [0, .025, .5, .9, .975, 1]
+    result = replistore.locus_quantiles(replistore.ReplicateStore(path), qs, chunk_trials=10)
+    expected = np.quantile(counts.sum(axis=1), qs, axis=0)
+    np.testing.assert_allclose(result, expected)
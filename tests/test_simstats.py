@@ -0,0 +1,48 @@
+# test_simstats.py
+# October 2026.
+
+import statistics
+
+import numpy as np
+import pytest
+
+import simstats
+
+def loop_anova(freqs):
+    # the F statistic as cropwild2's per-trial anova() computed it, [replicate][LG]
+    replicates, lg_count = freqs.shape
+    means = [statistics.mean(freqs[:, i]) for i in range(lg_count)]
+    variances = [statistics.variance(freqs[:, i]) for i in range(lg_count)]
+    grand = statistics.mean(means)
+    ssg = sum((grand - mean)**2 for mean in means)
+    sse = sum(variance * (replicates - 1) for variance in variances)
+    return (ssg / (lg_count - 1)) / (sse / (lg_count * (replicates - 1)))
+
+def test_anova_f_matches_per_trial_loop():
+    freqs = np.random.default_rng(1).random((6, 22, 17))
+    expected = [loop_anova(trial) for trial in freqs]
+    np.testing.assert_allclose(simstats.anova_f(freqs), expected, rtol=1e-12)
+
+def test_anova_f_needs_two_replicates():
+    with pytest.raises(ValueError):
+        simstats.anova_f(np.random.default_rng(1).random((3, 1, 17)))
+
+def test_max_min_diff():
+    freqs = np.array([[[.1, .5, .3], [.3, .1, .3]]])
+    np.testing.assert_allclose(simstats.max_min_diff(freqs), [.1])
+
+def test_order_statistics():
+    values = np.random.default_rng(2).random((5, 40))
+    ordered = np.sort(values, axis=1)
+    np.testing.assert_array_equal(simstats.order_statistics(values, [-1, -20, 0]), ordered[:, [-1, -20, 0]])
+
+@pytest.mark.parametrize("rank", [40, 41, -41])
+def test_order_statistics_rejects_ranks_outside_the_values(rank):
+    values = np.random.default_rng(3).random((2, 40))
+    with pytest.raises(IndexError):
+        simstats.order_statistics(values, [0, rank])
+
+def test_order_statistics_negative_ranks_count_from_the_top():
+    values = np.random.default_rng(4).random((3, 40))
+    np.testing.assert_array_equal(simstats.order_statistics(values, [-40, 39]),
+                                  simstats.order_statistics(values, [0, -1]))
@@ -0,0 +1,30 @@
+# test_sweep.py
+# October 2026.
+
+import csv
+
+import pytest
+
+import sweep
+
+GRID = {"YEARS": [8, 3], "NPOP": [30], "LG_COUNT": [2], "REPLICATES": [4]}
+
+def rows(path):
+    with open(path, newline="") as csvfile:
+        return list(csv.reader(csvfile))
+
+def test_rows_follow_the_schedule_for_any_workers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sweep.parallel, "CHUNK_TRIALS", 3)
+    sweep.run_sweep("cropwild2", GRID, 7, 5, str(tmp_path / "one.csv"))
+    sweep.run_sweep("cropwild2", GRID, 7, 5, str(tmp_path / "two.csv"), workers=2)
+    table = rows(tmp_path / "one.csv")
+    assert rows(tmp_path / "two.csv") == table
+    points = [row[0] for row in table[1:]]
+    assert points == ["1"] * 7 + ["0"] * 7  # the cheaper YEARS = 3 point first
+    assert [row[5] for row in table[1:8]] == [str(trial) for trial in range(7)]
+    assert not list(tmp_path.glob("*.txt"))  # no genotype dumps
+
+def test_grid_cannot_set_forced_constants():
+    with pytest.raises(ValueError):
+        sweep.point_overrides("cropwild2", {"OUTPUT_POLICY": "final"})
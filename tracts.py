@@ -0,0 +1,122 @@
+# tracts.py
+# October 2026.
+# Ancestry-tract chromosome model, independent of LOCI_PER_LG.
+# Every allele starts wild and crop pollen is all crop, so a homolog is fully described by
+# the sorted positions in [0, 1] where it switches between wild and crop, starting wild:
+# WILD = () has no crop alleles, CROP = (0.0,) is crop everywhere.  recombine() costs
+# O(tracts) rather than O(loci), and per-locus genotypes are only built at the end for a
+# SNP map.  With the evenly spaced map from snp_map(), a crossover drawn uniformly on (0, 1]
+# falls in each of the loci - 1 gaps between SNPs with equal probability, exactly like
+# random.randrange(1, LOCI_PER_LG) in the per-locus scripts.
+
+import bisect
+import random
+
+import numpy as np
+
+WILD = ()
+CROP = (0.0,)
+
+def snp_map(loci):
+    return np.linspace(0.0, 1.0, loci)  # SNP positions along each LG
+
+def crossover(below, above, rpoint):
+    # chromosome copying below before rpoint and above from rpoint on
+    i = bisect.bisect_left(below, rpoint)  # switches of below before rpoint
+    j = bisect.bisect_right(above, rpoint)  # switches of above up to rpoint
+    if i % 2 == j % 2:  # same allele on both sides of rpoint, no switch there
+        return below[:i] + above[j:]
+    return below[:i] + (rpoint,) + above[j:]
+
+def init_wildpop(params):
+    population = []
+    for k in range(params["npop"]):
+        individual = []
+        for i in range(params["lg_count"]):
+            individual.append([WILD, WILD])
+        population.append(individual)
+    return population  # [individual][LG][homolog], homolog is a tuple of switch positions
+
+def recombine(individual, child, homolog):  # write a recombinant gamete into one homolog of child
+    for i in range(len(individual)):
+        gchromo = individual[i][0]
+        hchromo = individual[i][1]
+        if gchromo == hchromo:  # every gamete is the same, no draws needed
+            child[i][homolog] = gchromo
+            continue
+        rpoint = 1.0 - random.random()  # uniform on (0, 1], so the first SNP always comes from the first homolog
+        x = random.random()  # randomly select one of four gametes, as in recombine() in the scripts
+        if x < .25:
+            child[i][homolog] = crossover(gchromo, hchromo, rpoint)
+        elif x < .5:
+            child[i][homolog] = crossover(hchromo, gchromo, rpoint)
+        elif x < .75:
+            child[i][homolog] = gchromo
+        else:
+            child[i][homolog] = hchromo
+
+def absorbed(population):
+    # True when every homolog of every LG is the same, so later years cannot change the population
+    first = population[0]
+    return all(g == h for g, h in first) and all(individual == first for individual in population)
+
+def make_replicate(params):
+    if params.get("genetic_map") is not None:
+        raise ValueError("the tracts backend models one crossover per LG; use the numpy backend with a genetic map")
+    if params.get("selection") is not None:
+        raise ValueError("the tracts backend is drift-only; use the numpy backend with selection")
+    npop = params["npop"]
+    population = init_wildpop(params)
+    newpop = init_wildpop(params)  # second buffer, filled in place each year
+    last_flow = max(params["gene_flow_list"], default=-1)
+    for year in range(params["years"]):
+        if year > last_flow and absorbed(population):
+            break
+        mctr = 0
+        if year in params["gene_flow_list"]:
+            mctr = int(npop * params["f1_rate"])  # obtain number of F1 progeny
+        for k in range(mctr):
+            recombine(population[random.randrange(0, npop)], newpop[k], 0)
+            for i in range(params["lg_count"]):
+                newpop[k][i][1] = CROP  # crop pollen has only crop alleles
+        for k in range(mctr, npop):
+            x = random.randrange(0, npop)
+            y = random.randrange(0, npop)
+            recombine(population[x], newpop[k], 0)
+            recombine(population[y], newpop[k], 1)
+        population, newpop = newpop, population
+    return population
+
+def materialize(population, positions, count=None):
+    # per-locus alleles of the first count individuals at the SNP positions,
+    # as [individual][LG][homolog][locus] like engine.py
+    if count is None:
+        count = len(population)
+    genomes = np.zeros((count, len(population[0]), 2, len(positions)), dtype=np.uint8)
+    for k in range(count):
+        for i in range(len(population[k])):
+            for h in range(2):
+                chromo = population[k][i][h]
+                if chromo:
+                    genomes[k, i, h] = np.searchsorted(chromo, positions, side="right") % 2
+    return genomes
+
+def crop_tracts(chromo):
+    # (start, end) of every crop tract on one homolog
+    ends = chromo[1::2] + (1.0,) * (len(chromo) % 2)
+    return list(zip(chromo[0::2], ends))
+
+def tract_distributions(population, count=None):
+    # crop tract lengths (fraction of the LG) and crop tracts per homolog over the first count individuals
+    if count is None:
+        count = len(population)
+    lengths = []
+    per_chromosome = []
+    for k in range(count):
+        for chromo_pair in population[k]:
+            for chromo in chromo_pair:
+                tracts = crop_tracts(chromo)
+                per_chromosome.append(len(tracts))
+                for start, end in tracts:
+                    lengths.append(end - start)
+    return lengths, per_chromosome